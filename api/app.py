@@ -1,4 +1,5 @@
 from flask import Flask, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from .auth import generate_token, verify_token, get_token_from_request
 from .users import users_bp
@@ -15,12 +16,81 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
+# orjson (opcional) para serializar as respostas JSON
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Remover sys.path.insert - usar imports normais
 from data import users_db, database
 
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Provider JSON do Flask usando orjson (serialização em C, bem mais rápida em respostas grandes).
+    
+    Como o provider padrão, converte chaves não-str para str, ordena as chaves e trata
+    datas/Decimal/UUID por DefaultJSONProvider.default. Diferenças em relação ao padrão:
+    - NaN e Infinity viram null (o padrão gera NaN/Infinity, que não é JSON válido)
+    - chaves int são ordenadas como texto depois de convertidas ("10" antes de "9"; o padrão
+      ordena pelo número)
+    Se o orjson não conseguir serializar algum valor (ex.: inteiro acima de 64 bits), usa o json
+    da biblioteca padrão.
+    """
+    
+    def _options(self, sort_keys: bool, indent: bool) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj, **kwargs):
+        option = self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        """
+        Como DefaultJSONProvider.response (usado por jsonify), mas entrega os bytes do orjson
+        direto à resposta, sem decodificar para str e codificar de novo.
+        
+        Mesmo contrato de JSONProvider.response: argumentos posicionais ou nomeados (não os
+        dois); sem argumentos serializa None, um posicional é o próprio valor e vários viram lista.
+        """
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        if len(args) == 1:
+            obj = args[0]
+        else:
+            obj = list(args) if args else (kwargs or None)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        option = self._options(self.sort_keys, indent) | orjson.OPT_APPEND_NEWLINE
+        try:
+            body = orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 # Remover static_folder (backend não serve frontend)
 app = Flask(__name__, 
             template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+# Templates só são rechecados no disco (stat a cada render) fora de produção
+app.config['TEMPLATES_AUTO_RELOAD'] = not IS_PRODUCTION
 
 # Configurar logging
 log_dir = ROOT_DIR / 'logs'
@@ -56,6 +56,9 @@ GOOGLE_SERVICE_ACCOUNT_FILE = os.environ.get(
     '/run/secrets/google.json'
 )
 
+# Tempo (segundos) que os dados lidos do Google Sheets ficam em cache; 0 desativa
+GOOGLE_SHEETS_CACHE_TTL = int(os.environ.get('GOOGLE_SHEETS_CACHE_TTL', '60'))
+
 # Mantido para compatibilidade (deprecated)
 GOOGLE_SHEETS_SPREADSHEET_ID = os.environ.get('GOOGLE_SHEETS_SPREADSHEET_ID', '')
 GOOGLE_SHEETS_CREDENTIALS_PATH = GOOGLE_SERVICE_ACCOUNT_FILE  # Alias para compatibilidade
@@ -69,10 +72,26 @@ REPORT_CONFIG_PATH = os.environ.get(
 # Logging
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO' if IS_PRODUCTION else 'DEBUG')
 
+# Log NDJSON de diagnóstico da geração de PDF em .cursor/debug.log (desligado por padrão)
+DEBUG_AGENT_LOG = os.environ.get('DEBUG_AGENT_LOG', 'false').lower() in ('true', '1', 'yes')
+
 # Paths para assets (para geração de PDF)
 IMAGES_DIR = ROOT_DIR / 'assets' / 'images'
 TEMPLATES_DIR = ROOT_DIR / 'api' / 'templates'
 
+# Embutir fontes completas no PDF (sem subsetting: renderização mais rápida, arquivo maior)
+PDF_FULL_FONTS = os.environ.get('PDF_FULL_FONTS', 'true').lower() in ('true', '1', 'yes')
+
+# Tempo (segundos) que um PDF gerado fica em cache para parâmetros e dados iguais; 0 desativa
+PDF_CACHE_TTL = int(os.environ.get('PDF_CACHE_TTL', '600'))
+
+# PDFs até este tamanho (bytes) são gerados em memória e entram no cache; maiores vão para um
+# arquivo temporário em disco e são enviados em streaming, sem cache
+PDF_SPOOL_MAX_SIZE = int(os.environ.get('PDF_SPOOL_MAX_SIZE', str(4 * 1024 * 1024)))
+
+# Validação completa (leitura da planilha) após upload Enel; por padrão apenas a assinatura do arquivo é verificada
+ENEL_VALIDATE_UPLOAD_DEEP = os.environ.get('ENEL_VALIDATE_UPLOAD_DEEP', 'false').lower() in ('true', '1', 'yes')
+
 # Diretório para armazenar planilhas enviadas
 SPREADSHEETS_DIR = ROOT_DIR / 'data' / 'spreadsheets'
 SPREADSHEETS_DIR.mkdir(parents=True, exist_ok=True)
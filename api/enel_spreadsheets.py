@@ -1,22 +1,41 @@
 """
 Blueprint para gerenciar upload e configuração de planilhas específicas do Enel
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, has_app_context
 from werkzeug.utils import secure_filename
 from .auth import login_required
 from . import config
-from data.database import get_db_connection
+from .spreadsheet_files import read_spreadsheet_file, read_spreadsheet_file_stream
+from data.database import get_pool, DB_PATH
 import os
 import re
+import shutil
+import tempfile
 import logging
+import copy
 from pathlib import Path
 import json
 from datetime import datetime
+from urllib.parse import unquote
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 enel_spreadsheets_bp = Blueprint('enel_spreadsheets', __name__, url_prefix='/api/enel-spreadsheets')
 logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+# orjson (opcional) é mais rápido para decodificar as linhas NDJSON dos logs de debug.
+# orjson.JSONDecodeError é subclasse de json.JSONDecodeError.
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+ALLOWED_EXTENSIONS = frozenset({'xlsx', 'xls', 'csv'})
 
 # Nomes das planilhas necessárias para o relatório Enel
 ENEL_REQUIRED_SPREADSHEETS = [
@@ -29,10 +48,322 @@ ENEL_REQUIRED_SPREADSHEETS = [
     'Registral e Notarial - Regularização RJ'
 ]
 
+# Versões pré-computadas para validação (busca O(1)) e mensagens de erro
+_ENEL_REQUIRED_SET = frozenset(ENEL_REQUIRED_SPREADSHEETS)
+_ENEL_REQUIRED_JOINED = ", ".join(ENEL_REQUIRED_SPREADSHEETS)
+_ALLOWED_EXTENSIONS_JOINED = ", ".join(ALLOWED_EXTENSIONS)
+
+
+# Tabela de tradução para o identificador seguro da planilha (nome de arquivo)
+_SAFE_ID_TABLE = str.maketrans({' ': '_', '/': '_', '\\': '_', 'á': 'a', 'Á': 'A', 'ã': 'a', 'Ã': 'A'})
+
+
+@lru_cache(maxsize=32)
+def _safe_id(spreadsheet_name: str) -> str:
+    """Identificador seguro da planilha usado no nome do arquivo (ENEL_<id>.<ext>)"""
+    return spreadsheet_name.translate(_SAFE_ID_TABLE)
+
 
 def allowed_file(filename):
     """Verifica se o arquivo tem extensão permitida"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return '.' in filename and filename.rpartition('.')[2].lower() in ALLOWED_EXTENSIONS
+
+
+# Diretório de planilhas como str (os.path é bem mais barato que pathlib no caminho de busca)
+_SPREADSHEETS_DIR_STR = os.fspath(config.SPREADSHEETS_DIR)
+
+# Palavras-chave usadas na busca de arquivos alternativos por tipo de planilha
+_SPREADSHEET_KEYWORDS = {
+    'ceara': ['ceara', 'ceará', 'cear'],
+    'alvaras': ['alvaras', 'alvarás', 'alvara'],
+    'legalizacao': ['legalizacao', 'legalização', 'legaliza'],
+    'regularizacao': ['regularizacao', 'regularização', 'regulariza']
+}
+_CEARA_ALVARAS_RE = re.compile('ceara|alvaras|alvarás')
+
+
+@lru_cache(maxsize=32)
+def _keyword_pattern(spreadsheet_name_lower: str):
+    """
+    Regex pré-compilada com todas as variantes dos grupos de _SPREADSHEET_KEYWORDS
+    presentes no nome da planilha (None se nenhum grupo se aplica).
+    Cada nome de arquivo é então testado com um único search em vez de um `in` por palavra.
+    """
+    relevant_keywords = []
+    for variants in _SPREADSHEET_KEYWORDS.values():
+        if any(variant in spreadsheet_name_lower for variant in variants):
+            relevant_keywords.extend(variants)
+    if not relevant_keywords:
+        return None
+    return re.compile('|'.join(map(re.escape, relevant_keywords)))
+
+
+def _index_spreadsheets_dir() -> dict:
+    """
+    Índice {nome em minúsculas: nome real} dos arquivos em SPREADSHEETS_DIR.
+    
+    Feito com um único os.scandir (sem stat por arquivo) e reaproveitado durante a
+    requisição via flask.g, já que várias buscas podem ocorrer no mesmo request (ex: PDF).
+    """
+    if has_app_context():
+        index = g.get('_spreadsheets_dir_index')
+        if index is not None:
+            return index
+    
+    index = {}
+    try:
+        with os.scandir(_SPREADSHEETS_DIR_STR) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    index.setdefault(entry.name.lower(), entry.name)
+    except OSError as e:
+        logger.error(f"Erro ao listar diretório de planilhas: {e}")
+    
+    if has_app_context():
+        g._spreadsheets_dir_index = index
+    return index
+
+
+def _try_expected_name(spreadsheet_name: str, file_name: str, index: dict):
+    """Nome esperado pela lógica do upload (ENEL_<id>.xlsx / .xls) - consulta direta ao índice."""
+    safe_spreadsheet_id = _safe_id(spreadsheet_name)
+    for ext in ('.xlsx', '.xls'):
+        name = index.get(f"enel_{safe_spreadsheet_id}{ext}".lower())
+        if name:
+            logger.info(f"Arquivo encontrado pelo nome esperado (lógica upload): {name}")
+            return os.path.join(_SPREADSHEETS_DIR_STR, name)
+    return None
+
+
+def _try_db_filename(spreadsheet_name: str, file_name: str, index: dict):
+    """Nome exato salvo no banco (file_name) - consulta direta ao índice."""
+    if not file_name:
+        return None
+    name = index.get(file_name.lower())
+    if name:
+        logger.info(f"Arquivo encontrado por nome: {name}")
+        return os.path.join(_SPREADSHEETS_DIR_STR, name)
+    return None
+
+
+def _try_keyword_scan(spreadsheet_name: str, file_name: str, index: dict):
+    """
+    Palavras-chave: arquivo de maior pontuação (empate: o primeiro listado).
+    - 50: arquivo ENEL_ com palavras-chave de Ceará/Alvarás (somente se file_name for informado)
+    - 40: arquivo ENEL_ contendo palavras-chave relacionadas ao nome da planilha
+    - 25: arquivo cujo nome contém file_name
+    """
+    spreadsheet_name_clean = _safe_id(spreadsheet_name).lower()
+    keyword_pattern = _keyword_pattern(spreadsheet_name.lower())
+    match_ceara_alvaras = 'ceara' in spreadsheet_name_clean or 'alvaras' in spreadsheet_name_clean
+    
+    best_score = 0
+    best_name = None
+    for name_lower, name in index.items():
+        if file_name and name_lower.startswith('enel_') and (
+            match_ceara_alvaras or _CEARA_ALVARAS_RE.search(name_lower)
+        ):
+            best_score, best_name = 50, name
+            break
+        if best_score < 40 and keyword_pattern and name.startswith('ENEL_') and keyword_pattern.search(name_lower):
+            best_score, best_name = 40, name
+        elif best_score < 25 and file_name and file_name in name:
+            best_score, best_name = 25, name
+    
+    if best_name is None:
+        return None
+    
+    logger.info(f"Arquivo encontrado por palavras-chave (pontuação {best_score}): {best_name}")
+    return os.path.join(_SPREADSHEETS_DIR_STR, best_name)
+
+
+_EXACT_STRATEGIES = (_try_expected_name, _try_db_filename)
+_ALL_STRATEGIES = _EXACT_STRATEGIES + (_try_keyword_scan,)
+
+
+def _find_spreadsheet(spreadsheet_name: str, file_name: str = None, use_keywords: bool = True):
+    """
+    Procura o arquivo de uma planilha ENEL em SPREADSHEETS_DIR usando o índice do diretório.
+    
+    Estratégias em ordem, parando na primeira que encontrar (nomes comparados sem
+    diferenciar maiúsculas/minúsculas):
+    1. _try_expected_name: nome esperado pela lógica do upload (ENEL_<id>.xlsx / .xls)
+    2. _try_db_filename: nome exato salvo no banco (file_name)
+    3. _try_keyword_scan: palavras-chave (somente se use_keywords)
+    
+    Args:
+        spreadsheet_name: Nome da planilha
+        file_name: Nome do arquivo salvo no banco (opcional)
+        use_keywords: Se False, considera apenas o nome esperado e o file_name exato
+    
+    Returns:
+        Caminho (str) do arquivo encontrado ou None
+    """
+    index = _index_spreadsheets_dir()
+    for strategy in (_ALL_STRATEGIES if use_keywords else _EXACT_STRATEGIES):
+        found = strategy(spreadsheet_name, file_name, index)
+        if found:
+            return found
+    return None
+
+
+def _parse_csv(value: str, cast=str):
+    """
+    Converte um parâmetro separado por vírgulas em lista (itens vazios ignorados).
+    Retorna None se o parâmetro não foi informado. Erros de conversão (cast) são propagados.
+    """
+    if not value:
+        return None
+    return [cast(item) for item in (token.strip() for token in value.split(',')) if item]
+
+
+def _tail(path, n: int, chunk_size: int = 8192) -> list:
+    """
+    Retorna as últimas n linhas de um arquivo de texto (UTF-8) sem lê-lo por inteiro:
+    lê blocos a partir do final até reunir n linhas completas.
+    """
+    if n <= 0:
+        return []
+    
+    with open(path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        buffer = bytearray()
+        while pos > 0 and buffer.count(b'\n') <= n:
+            read_size = min(chunk_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            buffer[:0] = f.read(read_size)
+    
+    lines = buffer.decode('utf-8', errors='replace').split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()  # Arquivo terminado em quebra de linha
+    return lines[-n:]
+
+
+def _count_lines(path, chunk_size: int = 1 << 20) -> int:
+    """Conta as linhas de um arquivo em blocos (sem materializar as linhas)"""
+    total = 0
+    last_byte = b'\n'
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            total += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+    # Última linha sem quebra de linha final também conta
+    return total + (last_byte != b'\n')
+
+
+# Assinaturas (magic bytes) dos formatos binários aceitos; CSV é texto e não tem assinatura
+_FILE_SIGNATURES = {
+    '.xlsx': b'PK\x03\x04',      # ZIP (Office Open XML)
+    '.xls': b'\xd0\xcf\x11\xe0',  # OLE2 (Excel 97-2003)
+}
+
+
+def _has_expected_signature(file_path: str, file_ext: str) -> bool:
+    """Verificação barata do upload: confere os primeiros bytes em vez de processar a planilha"""
+    signature = _FILE_SIGNATURES.get(file_ext.lower())
+    if signature is None:
+        return True
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(signature)) == signature
+    except OSError as e:
+        logger.error(f"ERRO ao testar acesso ao arquivo salvo: {e}")
+        return False
+
+
+def _database_version() -> tuple:
+    """
+    (mtime_ns, tamanho) do banco e do WAL: muda a cada commit, inclusive os feitos por
+    outros workers do Gunicorn, sem abrir conexão.
+    """
+    version = []
+    for path in (DB_PATH, DB_PATH + '-wal'):
+        try:
+            file_stat = os.stat(path)
+            version += (file_stat.st_mtime_ns, file_stat.st_size)
+        except FileNotFoundError:
+            version += (0, 0)
+    return tuple(version)
+
+
+@lru_cache(maxsize=256)
+def _lookup_spreadsheet_cached(spreadsheet_name: str, db_version: tuple):
+    """Registro da planilha por versão do banco (db_version faz parte da chave)."""
+    with get_pool().reader() as conn:
+        row = conn.execute('''
+            SELECT file_path, file_name, sheet_name, status_column
+            FROM enel_spreadsheets
+            WHERE spreadsheet_name = ?
+        ''', (spreadsheet_name,)).fetchone()
+    return tuple(row) if row else None
+
+
+def _lookup_spreadsheet(spreadsheet_name: str):
+    """
+    Busca (file_path, file_name, sheet_name, status_column) da planilha no banco.
+    
+    Returns:
+        Tupla com os dados da planilha ou None se não estiver cadastrada
+    """
+    return _lookup_spreadsheet_cached(spreadsheet_name, _database_version())
+
+
+@lru_cache(maxsize=16)
+def _read_spreadsheet_cached(file_path: str, mtime_ns: int, size: int, sheet_name: str, header: int) -> tuple:
+    """
+    Lê a planilha uma vez por versão do arquivo (mtime/tamanho fazem parte da chave, então
+    um arquivo substituído é relido automaticamente). Guarda só estruturas imutáveis
+    (tuplas), compartilhadas com segurança entre as threads das requisições.
+    """
+    sheet_data = read_spreadsheet_file_stream(file_path, sheet_name=sheet_name, header=header)
+    return (
+        tuple(sheet_data['headers']),
+        tuple(map(tuple, sheet_data['values'])),
+        sheet_data.get('sheet_name')
+    )
+
+
+def _read_spreadsheet(file_path: str, sheet_name: str = None, header: int = None) -> dict:
+    """
+    Lê a planilha pelo cache (_read_spreadsheet_cached) no mesmo formato de read_spreadsheet_file.
+    
+    Raises:
+        FileNotFoundError: Se o arquivo não existir
+        ValueError: Se o arquivo não puder ser lido
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+    headers, values, read_sheet_name = _read_spreadsheet_cached(
+        os.fspath(file_path), file_stat.st_mtime_ns, file_stat.st_size, sheet_name, header
+    )
+    return {'values': values, 'headers': list(headers), 'sheet_name': read_sheet_name}
+
+
+def _save_upload_atomic(file, file_path: str):
+    """
+    Grava o arquivo enviado em um temporário no próprio diretório de destino e o publica
+    com os.replace, para que leitores concorrentes nunca vejam um arquivo parcial.
+    
+    O conteúdo é copiado em blocos a partir do stream do upload (que o Werkzeug já mantém
+    em arquivo temporário para uploads grandes), com memória limitada.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix='.upload_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            shutil.copyfileobj(file.stream, tmp_file, 1024 * 1024)
+            tmp_file.flush()
+            os.fchmod(tmp_file.fileno(), 0o644)  # mkstemp cria com 0600
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
 
 
 @enel_spreadsheets_bp.route('/upload', methods=['POST'])
@@ -54,7 +385,7 @@ def upload_enel_spreadsheet():
         # Verificar extensão
         if not allowed_file(file.filename):
             return jsonify({
-                'error': f'Formato não suportado. Use: {", ".join(ALLOWED_EXTENSIONS)}'
+                'error': f'Formato não suportado. Use: {_ALLOWED_EXTENSIONS_JOINED}'
             }), 400
         
         # Obter parâmetros
@@ -63,9 +394,9 @@ def upload_enel_spreadsheet():
             return jsonify({'error': 'Parâmetro "spreadsheet_name" é obrigatório'}), 400
         
         # Validar se o nome da planilha é um dos permitidos
-        if spreadsheet_name not in ENEL_REQUIRED_SPREADSHEETS:
+        if spreadsheet_name not in _ENEL_REQUIRED_SET:
             return jsonify({
-                'error': f'Nome de planilha inválido. Deve ser um dos: {", ".join(ENEL_REQUIRED_SPREADSHEETS)}'
+                'error': f'Nome de planilha inválido. Deve ser um dos: {_ENEL_REQUIRED_JOINED}'
             }), 400
         
         sheet_name = request.form.get('sheet_name', None)
@@ -73,7 +404,7 @@ def upload_enel_spreadsheet():
         
         # Criar nome seguro para o arquivo baseado apenas no nome da planilha
         # Usar nome da planilha para criar identificador único (evitar duplicação)
-        safe_spreadsheet_id = spreadsheet_name.replace(' ', '_').replace('/', '_').replace('\\', '_').replace('á', 'a').replace('Á', 'A').replace('ã', 'a').replace('Ã', 'A')
+        safe_spreadsheet_id = _safe_id(spreadsheet_name)
         
         # Obter extensão do arquivo original
         original_filename = secure_filename(file.filename)
@@ -86,72 +417,72 @@ def upload_enel_spreadsheet():
         file_path = config.SPREADSHEETS_DIR / safe_filename
         
         try:
-            file.save(str(file_path))
+            # Publicação atômica: os.replace conclui ou levanta erro (não há arquivo parcial visível)
+            _save_upload_atomic(file, str(file_path))
         except Exception as save_error:
             logger.error(f"ERRO ao salvar arquivo: {save_error}", exc_info=True)
             return jsonify({'error': f'Erro ao salvar arquivo: {str(save_error)}'}), 500
         
-        # Validar que o arquivo foi salvo corretamente
-        if not file_path.exists():
-            logger.error(f"ERRO: Arquivo não foi salvo corretamente em {file_path}")
-            return jsonify({'error': 'Erro ao salvar arquivo'}), 500
-        
         logger.info(f"Arquivo salvo e validado: {file_path} para planilha Enel: {spreadsheet_name}")
         
         # Testar acesso ao arquivo imediatamente após salvar
-        try:
-            from .spreadsheet_files import read_spreadsheet_file
-            # Tentar ler a primeira aba do arquivo para validar acesso
-            test_data = read_spreadsheet_file(
-                file_path=str(file_path),
-                sheet_name=None  # Primeira aba
-            )
-            if test_data is None or len(test_data) == 0:
-                logger.warning(f"Arquivo salvo mas parece estar vazio ou inacessível: {file_path}")
-            else:
-                logger.info(f"Arquivo acessível e legível: {file_path} ({len(test_data)} linhas lidas)")
-        except Exception as e:
-            logger.error(f"ERRO ao testar acesso ao arquivo salvo: {e}")
-            # Não falhar o upload, mas registrar o erro
-            logger.warning(f"Arquivo salvo em {file_path} mas houve erro ao testar acesso: {str(e)}")
-        
-        # Salvar informações no banco de dados
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verificar se já existe registro para esta planilha
-        cursor.execute(
-            'SELECT id, file_path FROM enel_spreadsheets WHERE spreadsheet_name = ?',
-            (spreadsheet_name,)
-        )
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Atualizar registro existente
-            old_file_path = existing['file_path']
+        if config.ENEL_VALIDATE_UPLOAD_DEEP:
+            # Validação completa (opcional): reprocessa a planilha inteira
+            try:
+                # Tentar ler a primeira aba do arquivo para validar acesso
+                test_data = read_spreadsheet_file(
+                    file_path=str(file_path),
+                    sheet_name=None  # Primeira aba
+                )
+                if test_data is None or len(test_data) == 0:
+                    logger.warning(f"Arquivo salvo mas parece estar vazio ou inacessível: {file_path}")
+                else:
+                    logger.info(f"Arquivo acessível e legível: {file_path} ({len(test_data)} linhas lidas)")
+            except Exception as e:
+                logger.error(f"ERRO ao testar acesso ao arquivo salvo: {e}")
+                # Não falhar o upload, mas registrar o erro
+                logger.warning(f"Arquivo salvo em {file_path} mas houve erro ao testar acesso: {str(e)}")
+        elif not _has_expected_signature(str(file_path), file_ext):
+            # Não falhar o upload, mas registrar o problema
+            logger.warning(f"Arquivo salvo em {file_path} não tem a assinatura esperada para '{file_ext}'")
+        
+        # Salvar informações no banco de dados (conexão de escrita do pool; commit ao final do bloco).
+        # BEGIN IMMEDIATE: um único lock de escrita para a leitura do registro antigo + UPSERT.
+        with get_pool().writer() as conn:
+            conn.execute('BEGIN IMMEDIATE')
             
-            # Remover arquivo antigo se existir E for diferente do novo
-            if os.path.exists(old_file_path) and old_file_path != str(file_path):
-                try:
-                    os.remove(old_file_path)
-                    logger.info(f"Arquivo antigo removido: {old_file_path}")
-                except Exception as e:
-                    logger.warning(f"Erro ao remover arquivo antigo: {e}")
+            # Caminho do arquivo anterior (RETURNING devolveria apenas o valor novo)
+            existing = conn.execute(
+                'SELECT file_path FROM enel_spreadsheets WHERE spreadsheet_name = ?',
+                (spreadsheet_name,)
+            ).fetchone()
+            old_file_path = existing['file_path'] if existing else None
             
-            cursor.execute('''
-                UPDATE enel_spreadsheets 
-                SET file_path = ?, file_name = ?, sheet_name = ?, status_column = ?, uploaded_at = CURRENT_TIMESTAMP
-                WHERE spreadsheet_name = ?
-            ''', (str(file_path), safe_filename, sheet_name, status_column, spreadsheet_name))
-        else:
-            # Inserir novo registro
-            cursor.execute('''
+            conn.execute('''
                 INSERT INTO enel_spreadsheets (spreadsheet_name, file_path, file_name, sheet_name, status_column)
                 VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(spreadsheet_name) DO UPDATE SET
+                    file_path = excluded.file_path,
+                    file_name = excluded.file_name,
+                    sheet_name = excluded.sheet_name,
+                    status_column = excluded.status_column,
+                    uploaded_at = CURRENT_TIMESTAMP
             ''', (spreadsheet_name, str(file_path), safe_filename, sheet_name, status_column))
         
-        conn.commit()
-        conn.close()
+        # Remover arquivo antigo (após o commit) se for diferente do novo; um único unlink,
+        # sem checagem prévia de existência (que seria sujeita a corrida)
+        if old_file_path and old_file_path != str(file_path):
+            try:
+                os.unlink(old_file_path)
+                logger.info(f"Arquivo antigo removido: {old_file_path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Erro ao remover arquivo antigo: {e}")
+        
+        # Versões antigas em cache já seriam ignoradas pelo mtime (arquivo e banco); liberar a memória delas
+        _read_spreadsheet_cached.cache_clear()
+        _lookup_spreadsheet_cached.cache_clear()
         
         return jsonify({
             'message': 'Planilha enviada com sucesso',
@@ -170,37 +501,29 @@ def upload_enel_spreadsheet():
 def list_enel_spreadsheets():
     """Lista todas as planilhas do Enel (incluindo as que ainda não foram enviadas)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT spreadsheet_name, file_name, sheet_name, status_column, uploaded_at
-            FROM enel_spreadsheets
-            ORDER BY spreadsheet_name
-        ''')
-        uploaded_spreadsheets = {row['spreadsheet_name']: dict(row) for row in cursor.fetchall()}
-        conn.close()
+        with get_pool().reader() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Tuplas simples: colunas conhecidas, sem sqlite3.Row/dict por linha
+            cursor.execute('''
+                SELECT spreadsheet_name, file_name, sheet_name, status_column, uploaded_at
+                FROM enel_spreadsheets
+                ORDER BY spreadsheet_name
+            ''')
+            uploaded_spreadsheets = {row[0]: row for row in cursor.fetchall()}
         
         # Criar lista com todas as planilhas necessárias, indicando quais foram enviadas
-        result = []
-        for spreadsheet_name in ENEL_REQUIRED_SPREADSHEETS:
-            if spreadsheet_name in uploaded_spreadsheets:
-                result.append({
-                    'spreadsheet_name': spreadsheet_name,
-                    'file_name': uploaded_spreadsheets[spreadsheet_name]['file_name'],
-                    'sheet_name': uploaded_spreadsheets[spreadsheet_name]['sheet_name'],
-                    'status_column': uploaded_spreadsheets[spreadsheet_name]['status_column'],
-                    'uploaded_at': uploaded_spreadsheets[spreadsheet_name]['uploaded_at'],
-                    'is_uploaded': True
-                })
-            else:
-                result.append({
-                    'spreadsheet_name': spreadsheet_name,
-                    'file_name': None,
-                    'sheet_name': None,
-                    'status_column': None,
-                    'uploaded_at': None,
-                    'is_uploaded': False
-                })
+        # (uma única consulta ao dicionário por planilha)
+        result = [
+            {
+                'spreadsheet_name': spreadsheet_name,
+                'file_name': row[1] if (row := uploaded_spreadsheets.get(spreadsheet_name)) else None,
+                'sheet_name': row[2] if row else None,
+                'status_column': row[3] if row else None,
+                'uploaded_at': row[4] if row else None,
+                'is_uploaded': row is not None
+            }
+            for spreadsheet_name in ENEL_REQUIRED_SPREADSHEETS
+        ]
         
         return jsonify({'spreadsheets': result}), 200
     except Exception as e:
@@ -213,16 +536,15 @@ def list_enel_spreadsheets():
 def get_enel_spreadsheet_info(spreadsheet_name):
     """Obtém informações de uma planilha específica"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT spreadsheet_name, file_name, file_path, sheet_name, status_column, uploaded_at
-            FROM enel_spreadsheets
-            WHERE spreadsheet_name = ?
-        ''', (spreadsheet_name,))
+        with get_pool().reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT spreadsheet_name, file_name, file_path, sheet_name, status_column, uploaded_at
+                FROM enel_spreadsheets
+                WHERE spreadsheet_name = ?
+            ''', (spreadsheet_name,))
         
-        result = cursor.fetchone()
-        conn.close()
+            result = cursor.fetchone()
         
         if not result:
             return jsonify({'error': f'Planilha não encontrada: {spreadsheet_name}'}), 404
@@ -245,30 +567,37 @@ def get_required_spreadsheets():
 def debug_list_files():
     """Endpoint de debug para listar arquivos no diretório de planilhas"""
     try:
+        # os.scandir: tipo do arquivo vem da listagem (sem stat extra) e só um stat por arquivo para o tamanho
         files = []
-        if config.SPREADSHEETS_DIR.exists():
-            for file_path in config.SPREADSHEETS_DIR.iterdir():
-                if file_path.is_file():
-                    files.append({
-                        'name': file_path.name,
-                        'path': str(file_path),
-                        'exists': file_path.exists(),
-                        'size': file_path.stat().st_size if file_path.exists() else 0
-                    })
+        dir_exists = os.path.isdir(config.SPREADSHEETS_DIR)
+        if dir_exists:
+            with os.scandir(config.SPREADSHEETS_DIR) as entries:
+                files = [
+                    {
+                        'name': entry.name,
+                        'path': entry.path,
+                        'exists': True,  # scandir só retorna entradas existentes
+                        'size': entry.stat().st_size
+                    }
+                    for entry in entries if entry.is_file()
+                ]
         
         # Também listar registros do banco
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT spreadsheet_name, file_path, file_name
-            FROM enel_spreadsheets
-        ''')
-        db_records = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with get_pool().reader() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute('''
+                SELECT spreadsheet_name, file_path, file_name
+                FROM enel_spreadsheets
+            ''')
+            db_records = [
+                {'spreadsheet_name': spreadsheet_name, 'file_path': file_path, 'file_name': file_name}
+                for spreadsheet_name, file_path, file_name in cursor.fetchall()
+            ]
         
         return jsonify({
             'spreadsheets_dir': str(config.SPREADSHEETS_DIR),
-            'dir_exists': config.SPREADSHEETS_DIR.exists(),
+            'dir_exists': dir_exists,
             'files_in_dir': files,
             'db_records': db_records
         }), 200
@@ -280,7 +609,13 @@ def debug_list_files():
 @enel_spreadsheets_bp.route('/debug/logs/debug', methods=['GET'])
 @login_required
 def debug_get_debug_logs():
-    """Endpoint para acessar logs de debug (NDJSON)"""
+    """
+    Endpoint para acessar logs de debug (NDJSON)
+    
+    Query params:
+        lines: Quantidade de linhas finais a retornar (padrão: 100)
+        count_lines: Se 'true', calcula total_lines (exige ler o arquivo inteiro)
+    """
     try:
         debug_log_path = Path('.cursor') / 'debug.log'
         
@@ -294,32 +629,31 @@ def debug_get_debug_logs():
         # Ler últimas N linhas (padrão: 100)
         lines_limit = request.args.get('lines', type=int, default=100)
         
-        with open(debug_log_path, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
-        
-        # Pegar últimas N linhas
-        lines_to_return = all_lines[-lines_limit:] if len(all_lines) > lines_limit else all_lines
+        # Pegar últimas N linhas (leitura a partir do final do arquivo)
+        lines_to_return = _tail(debug_log_path, lines_limit)
+        total_lines = _count_lines(debug_log_path) if request.args.get('count_lines', '').lower() == 'true' else None
         
         # Tentar parsear cada linha como JSON
+        first_line_num = total_lines - len(lines_to_return) + 1 if total_lines is not None else None
         parsed_logs = []
-        for line_num, line in enumerate(lines_to_return, start=len(all_lines) - len(lines_to_return) + 1):
+        for offset, line in enumerate(lines_to_return):
             line = line.strip()
             if not line:
                 continue
             try:
-                log_entry = json.loads(line)
+                log_entry = _json_loads(line)
                 parsed_logs.append(log_entry)
             except json.JSONDecodeError:
                 # Se não for JSON válido, adicionar como texto
                 parsed_logs.append({
-                    'line': line_num,
+                    'line': first_line_num + offset if first_line_num is not None else None,
                     'raw': line,
                     'parse_error': True
                 })
         
         return jsonify({
             'path': str(debug_log_path),
-            'total_lines': len(all_lines),
+            'total_lines': total_lines,
             'returned_lines': len(parsed_logs),
             'logs': parsed_logs
         }), 200
@@ -328,63 +662,71 @@ def debug_get_debug_logs():
         return jsonify({'error': f'Erro ao ler logs de debug: {str(e)}'}), 500
 
 
+def _list_app_log_files(log_dir: str) -> list:
+    """Nomes dos arquivos app_*.log em log_dir, do mais recente para o mais antigo"""
+    with os.scandir(log_dir) as entries:
+        return sorted(
+            (entry.name for entry in entries
+             if entry.name.startswith('app_') and entry.name.endswith('.log') and entry.is_file()),
+            reverse=True
+        )
+
+
 @enel_spreadsheets_bp.route('/debug/logs/app', methods=['GET'])
 @login_required
 def debug_get_app_logs():
-    """Endpoint para acessar logs do Flask"""
+    """
+    Endpoint para acessar logs do Flask
+    
+    Query params:
+        file: Nome do arquivo de log (padrão: o de hoje ou o mais recente)
+        lines: Quantidade de linhas finais a retornar (padrão: 100)
+        count_lines: Se 'true', calcula total_lines (exige ler o arquivo inteiro)
+    """
     try:
-        from datetime import datetime
-        from .config import ROOT_DIR
-        
-        # Tentar arquivo de hoje primeiro
-        today_log = ROOT_DIR / 'logs' / f'app_{datetime.now().strftime("%Y%m%d")}.log'
-        
-        # Se não existir, listar todos os arquivos de log disponíveis
-        log_dir = ROOT_DIR / 'logs'
-        if not log_dir.exists():
+        log_dir = os.path.join(config.ROOT_DIR, 'logs')
+        if not os.path.isdir(log_dir):
             return jsonify({
                 'error': 'Diretório de logs não encontrado',
-                'path': str(log_dir),
+                'path': log_dir,
                 'exists': False
             }), 404
         
-        # Listar todos os arquivos de log
-        log_files = sorted([f for f in log_dir.glob('app_*.log')], reverse=True)
-        
-        # Se especificou um arquivo específico via query param
+        # Se especificou um arquivo específico via query param, usar direto (sem listar o diretório)
+        log_files = None
         log_file_name = request.args.get('file', None)
         if log_file_name:
-            log_path = log_dir / log_file_name
-            if not log_path.exists():
+            log_path = os.path.join(log_dir, log_file_name)
+            if not os.path.exists(log_path):
                 return jsonify({
                     'error': f'Arquivo de log não encontrado: {log_file_name}',
-                    'available_files': [f.name for f in log_files]
+                    'available_files': _list_app_log_files(log_dir)
                 }), 404
         else:
-            # Usar o mais recente ou o de hoje
-            log_path = today_log if today_log.exists() else (log_files[0] if log_files else None)
-        
-        if not log_path or not log_path.exists():
-            return jsonify({
-                'error': 'Nenhum arquivo de log encontrado',
-                'available_files': [f.name for f in log_files] if log_files else []
-            }), 404
+            # Usar o de hoje ou, se não existir, o mais recente
+            log_path = os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d")}.log')
+            if not os.path.exists(log_path):
+                log_files = _list_app_log_files(log_dir)
+                if not log_files:
+                    return jsonify({
+                        'error': 'Nenhum arquivo de log encontrado',
+                        'available_files': []
+                    }), 404
+                log_path = os.path.join(log_dir, log_files[0])
         
         # Ler últimas N linhas (padrão: 100)
         lines_limit = request.args.get('lines', type=int, default=100)
         
-        with open(log_path, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
-        
-        # Pegar últimas N linhas
-        lines_to_return = all_lines[-lines_limit:] if len(all_lines) > lines_limit else all_lines
+        # Pegar últimas N linhas (leitura a partir do final do arquivo)
+        lines_to_return = _tail(log_path, lines_limit)
+        total_lines = _count_lines(log_path) if request.args.get('count_lines', '').lower() == 'true' else None
         
         return jsonify({
-            'path': str(log_path),
-            'file_name': log_path.name,
-            'total_lines': len(all_lines),
+            'path': log_path,
+            'file_name': os.path.basename(log_path),
+            'total_lines': total_lines,
             'returned_lines': len(lines_to_return),
-            'available_files': [f.name for f in log_files],
+            'available_files': log_files if log_files is not None else _list_app_log_files(log_dir),
             'logs': [line.strip() for line in lines_to_return if line.strip()]
         }), 200
     except Exception as e:
@@ -400,220 +742,148 @@ def get_enel_spreadsheet_data(spreadsheet_name):
     Processa dados para criar estrutura hierárquica de estatísticas
     """
     try:
-        from .spreadsheet_files import read_spreadsheet_file
+        status_column_override = request.args.get('status_column', None)
         
-        # Buscar informações da planilha
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT file_path, file_name, sheet_name, status_column
-            FROM enel_spreadsheets
-            WHERE spreadsheet_name = ?
-        ''', (spreadsheet_name,))
+        # Obter anos da query string
+        years_param = request.args.get('years', '')
+        if years_param:
+            try:
+                years = _parse_csv(years_param, int)
+            except ValueError:
+                years = []
+        else:
+            # Usar anos padrão baseado em report_year_start e report_year_end
+            report_year_start = request.args.get('report_year_start', type=int) or 2024
+            report_year_end = request.args.get('report_year_end', type=int) or datetime.now().year
+            years = list(range(report_year_start, report_year_end + 1))
         
-        result = cursor.fetchone()
-        conn.close()
+        # Obter filtro de natureza da operação (para Licença Sanitária)
+        filter_natureza = request.args.get('filter_natureza', None)
         
-        if not result:
-            return jsonify({'error': f'Planilha não encontrada: {spreadsheet_name}'}), 404
+        # Decodificar URL se necessário
+        if filter_natureza:
+            filter_natureza = unquote(filter_natureza)
+
+        # Coluna de ano customizada (ex: Legalização SP)
+        year_column_name = request.args.get('year_column', None)
+        year_parse_mode = request.args.get('year_parse', None)
         
-        # Converter Row para dict para facilitar acesso
-        result_dict = dict(result)
+        # Parâmetros opcionais para filtros específicos
+        sheet_name = request.args.get('sheet_name', None)
+        header_row_param = request.args.get('header_row', None)
+        header_row = int(header_row_param) if header_row_param is not None else None
+        item_column = request.args.get('item_column', None)
+        item_not_equals = request.args.get('item_not_equals', None)
+        concluido_statuses = _parse_csv(request.args.get('concluido_statuses', None))
+        cancelado_statuses = _parse_csv(request.args.get('cancelado_statuses', None))
+        status_exclude = _parse_csv(request.args.get('status_exclude', None))
+    except Exception as e:
+        logger.error(f"Erro ao buscar dados da planilha: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Erro ao buscar dados: {str(e)}'}), 500
+    
+    result, status = _get_enel_spreadsheet_data_impl(
+        spreadsheet_name,
+        years,
+        filter_natureza=filter_natureza,
+        status_column_override=status_column_override,
+        year_column_name=year_column_name,
+        year_parse_mode=year_parse_mode,
+        sheet_name=sheet_name,
+        header_row=header_row,
+        item_column=item_column,
+        item_not_equals=item_not_equals,
+        concluido_statuses=concluido_statuses,
+        cancelado_statuses=cancelado_statuses,
+        status_exclude=status_exclude
+    )
+    return jsonify(result), status
+
+
+def _get_enel_spreadsheet_data_impl(
+    spreadsheet_name: str,
+    years: list,
+    filter_natureza: str = None,
+    status_column_override: str = None,
+    year_column_name: str = None,
+    year_parse_mode: str = None,
+    sheet_name: str = None,
+    header_row: int = None,
+    item_column: str = None,
+    item_not_equals: str = None,
+    concluido_statuses: list = None,
+    cancelado_statuses: list = None,
+    status_exclude: list = None
+):
+    """
+    Processamento de GET /<spreadsheet_name>/data com os filtros já como parâmetros, sem
+    contexto de requisição (chamado pela rota e direto pelo PDF). Mesma busca tolerante do
+    arquivo que a rota sempre fez (caminho relativo, palavras-chave, nova tentativa).
+    
+    Returns:
+        (dados processados, 200) ou ({'error': ...}, status)
+    """
+    try:
+        # Buscar informações da planilha (cache invalidado a cada commit no banco)
+        result = _lookup_spreadsheet(spreadsheet_name)
+        if not result:
+            return {'error': f'Planilha não encontrada: {spreadsheet_name}'}, 404
         
-        file_path = result_dict['file_path']
+        file_path, file_name, _, saved_status_column = result
         # Sempre usar a primeira aba (ignorar o nome salvo no banco)
         # Para 'ENEL - Legalização CE', usar coluna 'Relatório Status detalhado acionamento'
         # Para outras planilhas, usar coluna padrão 'Relatório Status detalhado'
-        status_column_override = request.args.get('status_column', None)
         if status_column_override:
             status_column = status_column_override
         elif spreadsheet_name == 'ENEL - Legalização CE':
             status_column = 'Relatório Status detalhado acionamento'
         else:
-            status_column = result_dict['status_column'] if result_dict['status_column'] else 'Relatório Status detalhado'
+            status_column = saved_status_column if saved_status_column else 'Relatório Status detalhado'
         
         logger.info(f"Usando planilha: {spreadsheet_name}, primeira aba (automática), coluna: {status_column}")
         
-        # Verificar se o arquivo existe
-        # Converter para Path se necessário
-        if isinstance(file_path, str):
-            file_path_obj = Path(file_path)
-        else:
-            file_path_obj = file_path
+        # Verificar se o arquivo existe (operações em str/os.path; sem objetos Path)
+        resolved_path = os.fspath(file_path)
         
         # Se o caminho não for absoluto, tentar construir caminho relativo ao SPREADSHEETS_DIR
-        if not file_path_obj.is_absolute():
-            # Tentar usar o caminho completo primeiro
-            if config.SPREADSHEETS_DIR.exists():
-                file_path_obj = config.SPREADSHEETS_DIR / file_path_obj.name
-            else:
-                # Se o diretório não existe, tentar usar o caminho como está
-                pass
+        if not os.path.isabs(resolved_path) and os.path.isdir(_SPREADSHEETS_DIR_STR):
+            resolved_path = os.path.join(_SPREADSHEETS_DIR_STR, os.path.basename(resolved_path))
         
         # Verificar se arquivo existe
-        if not file_path_obj.exists():
-            logger.warning(f"Arquivo não encontrado no caminho esperado: {file_path_obj}")
+        if not os.path.exists(resolved_path):
+            logger.warning(f"Arquivo não encontrado no caminho esperado: {resolved_path}")
             logger.info(f"Caminho original do banco: {file_path}")
             logger.info(f"SPREADSHEETS_DIR: {config.SPREADSHEETS_DIR}")
             
-            # Tentar encontrar o arquivo pelo nome no diretório de planilhas
-            file_name = result_dict.get('file_name', '')
-            found_file = None
-            
-            # PRIMEIRO: Tentar construir o nome esperado usando a mesma lógica do upload
-            if config.SPREADSHEETS_DIR.exists():
-                # Usar a mesma lógica do upload para construir o nome esperado
-                safe_spreadsheet_id = spreadsheet_name.replace(' ', '_').replace('/', '_').replace('\\', '_').replace('á', 'a').replace('Á', 'A').replace('ã', 'a').replace('Ã', 'A')
-                # Tentar extensões comuns
-                for ext in ['.xlsx', '.xls']:
-                    expected_filename = f"ENEL_{safe_spreadsheet_id}{ext}"
-                    expected_path = config.SPREADSHEETS_DIR / expected_filename
-                    if expected_path.exists():
-                        logger.info(f"Arquivo encontrado pelo nome esperado (lógica upload): {expected_path}")
-                        found_file = expected_path
-                        break
-            
-            # SEGUNDO: Tentar pelo file_name do banco de dados
-            if not found_file and file_name and config.SPREADSHEETS_DIR.exists():
-                # Tentar encontrar por nome exato
-                alternative_path = config.SPREADSHEETS_DIR / file_name
-                
-                if alternative_path.exists():
-                    logger.info(f"Arquivo encontrado por nome: {alternative_path}")
-                    found_file = alternative_path
-                else:
-                    # Procurar arquivos que contenham parte do nome da planilha
-                    # Normalizar nome da planilha para busca
-                    spreadsheet_name_clean = spreadsheet_name.replace(' ', '_').replace('á', 'a').replace('Á', 'A').replace('ã', 'a').replace('Ã', 'A').lower()
-                    all_files = list(config.SPREADSHEETS_DIR.glob('*'))
-                    
-                    # Buscar arquivos ENEL relacionados a esta planilha
-                    # Primeiro, tentar encontrar por padrão ENEL_ + nome da planilha
-                    expected_pattern = f"ENEL_{spreadsheet_name_clean}"
-                    for possible_file in all_files:
-                        if possible_file.is_file():
-                            file_name_lower = possible_file.name.lower()
-                            # Verificar se começa com ENEL_ e contém partes do nome da planilha
-                            if file_name_lower.startswith('enel_'):
-                                # Verificar palavras-chave específicas da planilha
-                                keywords = []
-                                if 'ceara' in spreadsheet_name_clean or 'ceara' in file_name_lower:
-                                    keywords.append('ceara')
-                                if 'alvaras' in spreadsheet_name_clean or 'alvaras' in file_name_lower or 'alvarás' in file_name_lower:
-                                    keywords.append('alvaras')
-                                
-                                # Se encontrou palavras-chave relevantes, usar este arquivo
-                                if keywords:
-                                    logger.info(f"Arquivo possível encontrado por palavras-chave: {possible_file}")
-                                    found_file = possible_file
-                                    
-                                    break
+            # Tentar encontrar o arquivo pelo nome no diretório de planilhas (uma única listagem)
+            file_name = file_name or ''
+            found_file = _find_spreadsheet(spreadsheet_name, file_name)
             
             if not found_file:
-                # ÚLTIMA TENTATIVA: Procurar qualquer arquivo ENEL_ que contenha palavras-chave relacionadas
-                if config.SPREADSHEETS_DIR.exists():
-                    try:
-                        all_enel_files = [f for f in config.SPREADSHEETS_DIR.glob('ENEL_*') if f.is_file()]
-                        # Normalizar nome da planilha para busca
-                        spreadsheet_name_lower = spreadsheet_name.lower()
-                        # Palavras-chave específicas para cada tipo de planilha
-                        keywords_map = {
-                            'ceara': ['ceara', 'ceará', 'cear'],
-                            'alvaras': ['alvaras', 'alvarás', 'alvara'],
-                            'legalizacao': ['legalizacao', 'legalização', 'legaliza'],
-                            'regularizacao': ['regularizacao', 'regularização', 'regulariza']
-                        }
-                        
-                        # Identificar palavras-chave relevantes para esta planilha
-                        relevant_keywords = []
-                        for key, variants in keywords_map.items():
-                            if any(variant in spreadsheet_name_lower for variant in variants):
-                                relevant_keywords.extend(variants)
-                        
-                        # Procurar arquivo que contenha essas palavras-chave
-                        for enel_file in all_enel_files:
-                            file_name_lower = enel_file.name.lower()
-                            if any(keyword in file_name_lower for keyword in relevant_keywords):
-                                logger.info(f"Arquivo encontrado por palavras-chave finais: {enel_file}")
-                                found_file = enel_file
-                                break
-                    except Exception as e:
-                        logger.error(f"Erro na busca final por palavras-chave: {e}")
+                # Listar arquivos no diretório para debug
+                files_in_dir = list(_index_spreadsheets_dir().values())
                 
-                # Se ainda não encontrou, listar arquivos no diretório para debug
-                if not found_file:
-                    files_in_dir = []
-                    if config.SPREADSHEETS_DIR.exists():
-                        try:
-                            files_in_dir = [str(f.name) for f in config.SPREADSHEETS_DIR.glob('*') if f.is_file()]
-                        except Exception as e:
-                            logger.error(f"Erro ao listar arquivos: {e}")
-                    
-                    return jsonify({
-                    'error': f'Arquivo não encontrado: {file_path_obj}',
+                return {
+                    'error': f'Arquivo não encontrado: {resolved_path}',
                     'original_path': str(file_path),
-                    'searched_path': str(file_path_obj),
+                    'searched_path': resolved_path,
                     'file_name': file_name,
                     'spreadsheets_dir': str(config.SPREADSHEETS_DIR),
                     'files_in_dir': files_in_dir,
                     'hint': 'Verifique se o arquivo foi enviado corretamente. Use /api/enel-spreadsheets/debug/files para ver arquivos disponíveis.'
-                }), 404
+                }, 404
             
-            file_path_obj = found_file
+            resolved_path = found_file
             
-        # Obter anos da query string
-        years_param = request.args.get('years', '')
-        if years_param:
-            try:
-                years = [int(y.strip()) for y in years_param.split(',') if y.strip()]
-            except ValueError:
-                years = []
-        else:
-            # Usar anos padrão baseado em report_year_start e report_year_end
-            report_year_start = request.args.get('report_year_start', type=int) or 2024
-            report_year_end = request.args.get('report_year_end', type=int) or datetime.now().year
-            years = list(range(report_year_start, report_year_end + 1))
-        
-        # Obter filtro de natureza da operação (para Licença Sanitária)
-        filter_natureza = request.args.get('filter_natureza', None)
-        
-        # Decodificar URL se necessário
-        if filter_natureza:
-            from urllib.parse import unquote
-            filter_natureza = unquote(filter_natureza)
-
         # Coluna de ano customizada (ex: Legalização SP)
-        year_column_name = request.args.get('year_column', None)
-        year_parse_mode = request.args.get('year_parse', None)
         if spreadsheet_name == 'Legalização SP' and not year_column_name:
             year_column_name = 'Data de acionamento MR'
             year_parse_mode = 'last4'
         
-        # Parâmetros opcionais para filtros específicos
-        sheet_name = request.args.get('sheet_name', None)
-        header_row_param = request.args.get('header_row', None)
-        header_row = int(header_row_param) if header_row_param is not None else None
-        item_column = request.args.get('item_column', None)
-        item_not_equals = request.args.get('item_not_equals', None)
-        concluido_statuses_param = request.args.get('concluido_statuses', None)
-        concluido_statuses = None
-        if concluido_statuses_param:
-            concluido_statuses = [v.strip() for v in concluido_statuses_param.split(',') if v.strip()]
-        cancelado_statuses_param = request.args.get('cancelado_statuses', None)
-        cancelado_statuses = None
-        if cancelado_statuses_param:
-            cancelado_statuses = [v.strip() for v in cancelado_statuses_param.split(',') if v.strip()]
-        status_exclude_param = request.args.get('status_exclude', None)
-        status_exclude = None
-        if status_exclude_param:
-            status_exclude = [v.strip() for v in status_exclude_param.split(',') if v.strip()]
-
-        
         if not years:
             years = [2024, 2025]  # Fallback
         
         # Ler arquivo
-        logger.info(f"Lendo arquivo: {file_path_obj}")
+        logger.info(f"Lendo arquivo: {resolved_path}")
         try:
             # Somente 'ENEL - Legalização CE' tem tabela começando na 5ª linha (índice 4)
             # 'Base Ceara Alvarás de funcionamento' começa na primeira linha (normal)
@@ -626,41 +896,39 @@ def get_enel_spreadsheet_data(spreadsheet_name):
                     header_row = None  # None = primeira linha (0) como cabeçalho
                     logger.info(f"Planilha '{spreadsheet_name}': usando primeira linha como cabeçalho")
             
-            sheet_data = read_spreadsheet_file(
-                file_path=str(file_path_obj),
+            sheet_data = _read_spreadsheet(
+                file_path=resolved_path,
                 sheet_name=sheet_name,  # None = primeira aba automaticamente
                 header=header_row
             )
         except FileNotFoundError as e:
             logger.error(f"Arquivo não encontrado: {e}")
             # Tentar buscar por nome similar no diretório
-            file_name = result_dict.get('file_name', '')
+            file_name = file_name or ''
             if file_name:
-                # Procurar arquivos que contenham parte do nome
-                possible_files = list(config.SPREADSHEETS_DIR.glob(f'*{file_name}*'))
-                if possible_files:
-                    logger.info(f"Arquivos similares encontrados: {[str(f) for f in possible_files]}")
-                    # Tentar usar o primeiro arquivo encontrado
-                    file_path_obj = possible_files[0]
-                    logger.info(f"Tentando usar arquivo: {file_path_obj} (primeira aba)")
+                # Procurar outro arquivo compatível (mesma busca pontuada do fallback acima)
+                possible_file = _find_spreadsheet(spreadsheet_name, file_name)
+                if possible_file and possible_file != resolved_path:
+                    resolved_path = possible_file
+                    logger.info(f"Tentando usar arquivo: {resolved_path} (primeira aba)")
                     # Somente 'ENEL - Legalização CE' tem tabela começando na 5ª linha
                     if header_row is None:
                         header_row = None
                         if spreadsheet_name == 'ENEL - Legalização CE':
                             header_row = 4  # Linha 4 (0-indexed) = 5ª linha
-                    sheet_data = read_spreadsheet_file(
-                        file_path=str(file_path_obj),
+                    sheet_data = _read_spreadsheet(
+                        file_path=resolved_path,
                         sheet_name=sheet_name,  # None = primeira aba automaticamente
                         header=header_row
                     )
                 else:
-                    return jsonify({
-                        'error': f'Arquivo não encontrado: {file_path_obj}',
+                    return {
+                        'error': f'Arquivo não encontrado: {resolved_path}',
                         'original_path': str(file_path),
                         'file_name': file_name,
                         'spreadsheets_dir': str(config.SPREADSHEETS_DIR),
                         'hint': 'Verifique se o arquivo foi enviado corretamente'
-                    }), 404
+                    }, 404
             else:
                 raise
         
@@ -684,72 +952,45 @@ def get_enel_spreadsheet_data(spreadsheet_name):
             # Se a coluna não foi encontrada, retornar dados vazios com informações sobre colunas disponíveis
             if "não encontrada" in str(ve):
                 headers = sheet_data.get('headers', [])
-                
-                processed_data = {
-                    'total_demandado': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 100.0},
-                    'concluidos': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                    'em_andamento': {
-                        'total': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                        'subcategorias': []
-                    },
-                    'warning': f"Coluna '{status_column}' não encontrada",
-                    'available_columns': headers,
-                    'requested_column': status_column
-                }
+                processed_data = _empty_result(
+                    years, f"Coluna '{status_column}' não encontrada", headers,
+                    requested_column=status_column
+                )
             else:
                 raise
         
-        return jsonify(processed_data), 200
+        return processed_data, 200
         
     except FileNotFoundError as e:
         logger.error(f"Arquivo não encontrado: {str(e)}", exc_info=True)
-        return jsonify({
+        return {
             'error': f'Arquivo não encontrado: {str(e)}',
             'hint': 'Verifique se a planilha foi enviada corretamente através do upload'
-        }), 404
+        }, 404
     except Exception as e:
         logger.error(f"Erro ao buscar dados da planilha: {str(e)}", exc_info=True)
-        return jsonify({'error': f'Erro ao buscar dados: {str(e)}'}), 500
+        return {'error': f'Erro ao buscar dados: {str(e)}'}, 500
 
 
-def _get_enel_spreadsheet_data_internal(
+def _load_enel_spreadsheet_internal(
     spreadsheet_name: str,
-    years: list = None,
-    filter_natureza: str = None,
-    year_column_name: str = None,
-    year_parse_mode: str = None,
     sheet_name: str = None,
     header_row: int = None,
-    item_column: str = None,
-    item_not_equals: str = None,
-    concluido_statuses: list = None,
-    cancelado_statuses: list = None,
-    status_exclude: list = None,
     status_column_override: str = None
 ):
     """
-    Função interna para obter dados de planilha sem depender do contexto Flask.
-    Pode ser chamada diretamente com parâmetros.
-    """
-    from .spreadsheet_files import read_spreadsheet_file
-    
-    # Buscar informações da planilha
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT file_path, file_name, sheet_name, status_column
-        FROM enel_spreadsheets
-        WHERE spreadsheet_name = ?
-    ''', (spreadsheet_name,))
-    
-    result = cursor.fetchone()
-    conn.close()
+    Localiza e lê a planilha ENEL sem depender do contexto Flask.
     
+    Returns:
+        Tupla (sheet_data, status_column, None) em caso de sucesso ou
+        (None, None, ({'error': ...}, status)) em caso de erro
+    """
+    # Buscar informações da planilha (cache invalidado a cada commit no banco)
+    result = _lookup_spreadsheet(spreadsheet_name)
     if not result:
-        return jsonify({'error': f'Planilha não encontrada: {spreadsheet_name}'}), 404
+        return None, None, ({'error': f'Planilha não encontrada: {spreadsheet_name}'}, 404)
     
-    result_dict = dict(result)
-    file_path = result_dict['file_path']
+    file_path, file_name, _, saved_status_column = result
     
     # Determinar coluna de status
     if status_column_override:
@@ -757,38 +998,19 @@ def _get_enel_spreadsheet_data_internal(
     elif spreadsheet_name == 'ENEL - Legalização CE':
         status_column = 'Relatório Status detalhado acionamento'
     else:
-        status_column = result_dict['status_column'] if result_dict['status_column'] else 'Relatório Status detalhado'
-    
-    # Converter para Path
-    if isinstance(file_path, str):
-        file_path_obj = Path(file_path)
-    else:
-        file_path_obj = file_path
+        status_column = saved_status_column if saved_status_column else 'Relatório Status detalhado'
     
     # Verificar se arquivo existe
-    if not file_path_obj.exists():
-        # Buscar arquivo alternativo (mesma lógica da função principal)
-        file_name = result_dict.get('file_name', '')
-        found_file = None
-        
-        if config.SPREADSHEETS_DIR.exists():
-            safe_spreadsheet_id = spreadsheet_name.replace(' ', '_').replace('/', '_').replace('\\', '_').replace('á', 'a').replace('Á', 'A').replace('ã', 'a').replace('Ã', 'A')
-            for ext in ['.xlsx', '.xls']:
-                expected_filename = f"ENEL_{safe_spreadsheet_id}{ext}"
-                expected_path = config.SPREADSHEETS_DIR / expected_filename
-                if expected_path.exists():
-                    found_file = expected_path
-                    break
-        
-        if not found_file and file_name and config.SPREADSHEETS_DIR.exists():
-            alternative_path = config.SPREADSHEETS_DIR / file_name
-            if alternative_path.exists():
-                found_file = alternative_path
+    resolved_path = os.fspath(file_path)
+    if not os.path.exists(resolved_path):
+        # Buscar arquivo alternativo (nome esperado ou file_name exato, sem palavras-chave)
+        file_name = file_name or ''
+        found_file = _find_spreadsheet(spreadsheet_name, file_name, use_keywords=False)
         
         if not found_file:
-            return jsonify({'error': f'Arquivo não encontrado: {file_path_obj}'}), 404
+            return None, None, ({'error': f'Arquivo não encontrado: {resolved_path}'}, 404)
         
-        file_path_obj = found_file
+        resolved_path = found_file
     
     # Ler arquivo
     if header_row is None:
@@ -797,11 +1019,42 @@ def _get_enel_spreadsheet_data_internal(
         else:
             header_row = None
     
-    sheet_data = read_spreadsheet_file(
-        file_path=str(file_path_obj),
+    sheet_data = _read_spreadsheet(
+        file_path=resolved_path,
         sheet_name=sheet_name,
         header=header_row
     )
+    return sheet_data, status_column, None
+
+
+def _get_enel_spreadsheet_data_internal(
+    spreadsheet_name: str,
+    years: list = None,
+    filter_natureza: str = None,
+    year_column_name: str = None,
+    year_parse_mode: str = None,
+    sheet_name: str = None,
+    header_row: int = None,
+    item_column: str = None,
+    item_not_equals: str = None,
+    concluido_statuses: list = None,
+    cancelado_statuses: list = None,
+    status_exclude: list = None,
+    status_column_override: str = None
+):
+    """
+    Função interna para obter dados de planilha sem depender do contexto Flask.
+    Pode ser chamada diretamente com parâmetros.
+    
+    Returns:
+        (dados processados, 200) ou ({'error': ...}, status); a serialização JSON fica
+        a cargo de quem responde à requisição
+    """
+    sheet_data, status_column, error = _load_enel_spreadsheet_internal(
+        spreadsheet_name, sheet_name, header_row, status_column_override
+    )
+    if error:
+        return error
     
     # Processar dados
     if years is None:
@@ -825,7 +1078,312 @@ def _get_enel_spreadsheet_data_internal(
         status_exclude=status_exclude
     )
     
-    return jsonify(processed_data), 200
+    return processed_data, 200
+
+
+def _get_enel_spreadsheet_data_by_natureza_internal(
+    spreadsheet_name: str,
+    natureza_values: list,
+    years: list = None
+):
+    """
+    Variante interna para vários filtros de natureza na mesma planilha: lê o arquivo uma vez e
+    processa todas as naturezas em uma única passada pelas linhas.
+    
+    Returns:
+        ({natureza: dados}, 200) ou ({'error': ...}, status)
+    """
+    sheet_data, status_column, error = _load_enel_spreadsheet_internal(spreadsheet_name)
+    if error:
+        return error
+    
+    if years is None:
+        years = [2024, 2025, 2026]  # Default
+    
+    processed_by_natureza = process_enel_legalizacao_data_by_natureza(
+        data=sheet_data,
+        status_column=status_column,
+        years=years,
+        natureza_values=natureza_values
+    )
+    
+    return processed_by_natureza, 200
+
+
+@lru_cache(maxsize=16)
+def _empty_result_template(years: tuple) -> dict:
+    """Estrutura zerada de process_enel_legalizacao_data para os anos informados (não modificar)."""
+    zero_years = dict.fromkeys(years, 0)
+    return {
+        'total_demandado': {'years': dict(zero_years), 'total': 0, 'percentage': 100.0},
+        'concluidos': {'years': dict(zero_years), 'total': 0, 'percentage': 0.0},
+        'em_andamento': {
+            'total': {'years': dict(zero_years), 'total': 0, 'percentage': 0.0},
+            'subcategorias': []
+        }
+    }
+
+
+def _empty_result(years: list, warning: str = None, headers: list = None, **requested) -> dict:
+    """
+    Monta o resultado vazio (nenhuma linha contabilizada) de process_enel_legalizacao_data.
+    
+    Retorna uma cópia do template em cache, que pode ser modificada livremente.
+    
+    Args:
+        years: Lista de anos
+        warning: Aviso sobre coluna não encontrada (opcional)
+        headers: Colunas disponíveis, retornadas junto com o aviso
+        **requested: Coluna solicitada (ex: requested_column='...')
+    """
+    result = copy.deepcopy(_empty_result_template(tuple(years)))
+    if warning:
+        result['warning'] = warning
+        result['available_columns'] = headers
+        result.update(requested)
+    return result
+
+
+def _sum_year_counts(year_keys: list, counts: np.ndarray) -> dict:
+    """Soma as contagens por ano de um grupo de status (linhas da matriz counts)."""
+    year_totals = counts.sum(axis=0).tolist()
+    return {
+        'years': dict(zip(year_keys, year_totals)),
+        'total': sum(year_totals),
+        'percentage': 0.0
+    }
+
+
+def _to_float(value):
+    """float(value) ou None se o valor não for numérico."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _values_equal(left: str, right: str, right_number: float = None) -> bool:
+    """
+    Compara valores de célula: numericamente quando ambos são números (ex: '53' == '53.0'),
+    senão como texto sem diferenciar maiúsculas/minúsculas.
+    
+    Args:
+        right_number: float(right) já calculado por quem chama (None se right não é número)
+    """
+    if right_number is not None:
+        left_number = _to_float(left)
+        if left_number is not None:
+            return left_number == right_number
+    return left.strip().lower() == right.strip().lower()
+
+
+def _normalize_text(series: pd.Series) -> pd.Series:
+    """Equivalente vetorizado de ' '.join(valor.split()).lower() para uma Series de str."""
+    return series.str.strip().str.replace(r'\s+', ' ', regex=True).str.lower()
+
+
+def _map_unique(values: pd.Series, func) -> np.ndarray:
+    """
+    Aplica func (operações vetorizadas sobre uma Series) somente aos valores distintos da
+    coluna e expande o resultado para todas as linhas pelos códigos do factorize.
+    Planilhas têm muitas linhas e poucos valores distintos por coluna (status, natureza, ano).
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return func(pd.Series(uniques, dtype=object)).to_numpy()[codes]
+
+
+# Ano (19xx/20xx) dentro de textos com data/hora; compilado uma vez (grupo exigido por str.extract)
+_YEAR_RE = re.compile(r'((?:19|20)\d{2})')
+
+
+def _parse_years(values: pd.Series, year_parse_mode: str) -> pd.Series:
+    """
+    Interpreta valores da coluna de ano conforme o modo, de forma vetorizada.
+    
+    Returns:
+        Series float com o ano de cada valor (NaN quando não há ano válido)
+    """
+    year_str = values.map(str).str.strip()
+    
+    if year_parse_mode == 'last4':
+        # Últimos 4 caracteres numéricos; senão, ano dentro de strings com data/hora
+        # (ex: "2024-07-22 00:00:00"). Textos como 'Não acionado' não têm ano e são ignorados.
+        suffix = year_str.str[-4:]
+        from_suffix = pd.to_numeric(suffix.where(suffix.str.isdigit()), errors='coerce')
+        from_match = pd.to_numeric(year_str.str.extract(_YEAR_RE, expand=False), errors='coerce')
+        return from_suffix.fillna(from_match).where(year_str.str.len() >= 4)
+    if year_parse_mode == 'extract_year':
+        return pd.to_numeric(year_str.str.extract(_YEAR_RE, expand=False), errors='coerce')
+    # Valor numérico (pode vir como float string "2024.0"); parte fracionária descartada como em int()
+    return np.trunc(pd.to_numeric(year_str, errors='coerce'))
+
+
+_NATUREZA_COLUMN = 'Relatório Natureza da Operação'
+
+
+def _header_index(headers: list) -> dict:
+    """
+    Índice {cabeçalho normalizado (trim, minúsculas): posição} para busca de colunas em O(1).
+    Em cabeçalhos repetidos vale a primeira ocorrência; cabeçalhos que não são str são ignorados.
+    """
+    header_idx = {}
+    for idx, header in enumerate(headers):
+        if isinstance(header, str):
+            header_idx.setdefault(header.strip().lower(), idx)
+    return header_idx
+
+
+def _year_positions(values: pd.Series, year_keys: list, year_parse_mode: str) -> np.ndarray:
+    """
+    Posição do ano de cada linha em year_keys (-1: sem ano válido ou fora dos anos solicitados).
+    
+    No modo padrão, uma coluna inteiramente numérica (ex: células numéricas lidas pelo openpyxl)
+    vai direto para float, sem passar por str(); as demais seguem a interpretação de _parse_years.
+    """
+    year_index = pd.Index(year_keys)
+    numeric_mode = year_parse_mode not in ('last4', 'extract_year')
+    if numeric_mode and pd.api.types.infer_dtype(values, skipna=False) in ('integer', 'floating', 'mixed-integer-float'):
+        return year_index.get_indexer(np.trunc(values.to_numpy(dtype=float)))
+    return year_index.get_indexer(
+        _map_unique(values, lambda years: _parse_years(years, year_parse_mode)).astype(float)
+    )
+
+
+def _peek_rows(rows):
+    """
+    Verifica se há linhas aceitando lista ou iterador de uma única passada
+    (ex: read_spreadsheet_file_stream), sem consumir a primeira linha.
+    
+    Returns:
+        Tupla (tem_linhas, linhas) - usar as linhas retornadas no lugar das originais
+    """
+    if isinstance(rows, (list, tuple)):
+        return bool(rows), rows
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return False, ()
+    return True, chain((first,), rows)
+
+
+def _count_status_years(
+    rows,
+    status_col_idx: int,
+    year_col_idx: int,
+    natureza_col_idx: int,
+    item_col_idx: int,
+    year_keys: list,
+    year_parse_mode: str,
+    filter_natureza: str,
+    item_not_equals: str,
+    status_exclude_normalized: set
+):
+    """
+    Conta as linhas por status normalizado e ano com operações vetorizadas (pandas/NumPy), sem
+    loop Python por linha: filtros viram máscaras booleanas e a contagem é um np.bincount.
+    As linhas (lista ou iterador) são percorridas uma única vez, guardando só as colunas usadas.
+    
+    Returns:
+        Tupla (status_names, originals, counts, total_by_year, total_all):
+        - status_names: array dos status normalizados, na ordem da primeira linha contada
+        - originals: array com a grafia original (primeira linha contada) de cada status
+        - counts: matriz (len(status_names), len(year_keys)) com as contagens por ano
+        - total_by_year: contagens por ano de todos os status
+        - total_all: total de linhas contadas
+    """
+    n_years = len(year_keys)
+    no_status = np.empty(0, dtype=object)
+    empty = (no_status, no_status, np.zeros((0, n_years), dtype=np.int64), np.zeros(n_years, dtype=np.int64), 0)
+    
+    # Colunas usadas pelos filtros ativos; linhas sem colunas suficientes são ignoradas
+    filter_item = item_col_idx is not None and item_not_equals is not None
+    filter_by_natureza = bool(filter_natureza) and natureza_col_idx is not None
+    columns = {'status': status_col_idx, 'year': year_col_idx}
+    if filter_by_natureza:
+        columns['natureza'] = natureza_col_idx
+    if filter_item:
+        columns['item'] = item_col_idx
+    min_len = max(idx for idx in (status_col_idx, year_col_idx, natureza_col_idx, item_col_idx) if idx is not None) + 1
+    
+    column_names = list(columns)
+    extracted = None
+    if isinstance(rows, (list, tuple)):
+        # Caminho rápido (planilhas retangulares, o caso normal): extração em C, sem checar o
+        # tamanho de cada linha. Buscar também a posição min_len - 1 (coluna extra, ignorada)
+        # faz uma linha curta levantar IndexError; só então as linhas são filtradas uma a uma
+        try:
+            extracted = list(map(itemgetter(*columns.values(), min_len - 1), rows))
+            column_names.append('_min_len')
+        except IndexError:
+            pass
+    if extracted is None:
+        get_columns = itemgetter(*columns.values())
+        extracted = [get_columns(row) for row in rows if len(row) >= min_len]
+    
+    frame = pd.DataFrame(extracted, columns=column_names, dtype=object)
+    if frame.empty:
+        return empty
+    
+    keep = np.ones(len(frame), dtype=bool)
+    
+    # Filtro de item (ex: Item != 53): comparação numérica quando ambos os lados são números,
+    # senão texto sem diferenciar maiúsculas/minúsculas
+    if filter_item:
+        compare_value_str = str(item_not_equals).strip()
+        compare_value = _to_float(compare_value_str)
+        keep &= ~_map_unique(
+            frame['item'],
+            lambda items: items.map(lambda item: _values_equal(str(item).strip(), compare_value_str, compare_value))
+        ).astype(bool)
+    
+    # Filtro de natureza da operação (case-insensitive, com normalização de espaços)
+    if filter_by_natureza:
+        filter_natureza_normalized = ' '.join(filter_natureza.split()).lower()
+        keep &= _map_unique(
+            frame['natureza'], lambda naturezas: _normalize_text(naturezas.map(str)) == filter_natureza_normalized
+        ).astype(bool)
+    
+    # Status: internado uma vez (códigos por linha); trim, normalização, vazio e exclusões são
+    # calculados só sobre os valores distintos e aplicados às linhas pelos códigos
+    raw_codes, raw_statuses = pd.factorize(frame['status'], use_na_sentinel=False)
+    status_str = pd.Series(raw_statuses, dtype=object).map(str).str.strip()
+    status_normalized = _normalize_text(status_str)
+    normalized_codes, normalized_statuses = pd.factorize(status_normalized)
+    valid_status = status_str != ''
+    if status_exclude_normalized:
+        valid_status &= ~status_normalized.isin(status_exclude_normalized)
+    keep &= valid_status.to_numpy(dtype=bool)[raw_codes]
+    
+    # Ano: somente os anos solicitados
+    year_pos = _year_positions(frame['year'], year_keys, year_parse_mode)
+    keep &= year_pos >= 0
+    
+    # Diagnóstico só com DEBUG ativo (fora do caminho normal das requisições)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"Contagem ENEL: {len(frame)} linhas lidas, {int(keep.sum())} contadas, "
+            f"{int((status_str == '').to_numpy(dtype=bool)[raw_codes].sum())} com status vazio, "
+            f"{int((year_pos < 0).sum())} sem ano no período"
+        )
+    
+    if not keep.any():
+        return empty
+    
+    # Códigos densos de status na ordem da primeira linha contada (factorize preserva a ordem)
+    kept_raw_codes = raw_codes[keep]
+    status_codes, status_order = pd.factorize(normalized_codes[kept_raw_codes])
+    n_status = len(status_order)
+    
+    # Contagem em C: um único bincount sobre o índice achatado (status, ano) da matriz
+    counts = np.bincount(
+        status_codes * n_years + year_pos[keep], minlength=n_status * n_years
+    ).reshape(n_status, n_years)
+    
+    # Grafia original = a da primeira linha contada de cada status
+    first_rows = np.unique(status_codes, return_index=True)[1]
+    originals = status_str.to_numpy(dtype=object)[kept_raw_codes[first_rows]]
+    
+    return normalized_statuses[status_order], originals, counts, counts.sum(axis=0), int(keep.sum())
 
 
 def process_enel_legalizacao_data(
@@ -839,7 +1397,8 @@ def process_enel_legalizacao_data(
     item_not_equals: str = None,
     concluido_statuses: list = None,
     cancelado_statuses: list = None,
-    status_exclude: list = None
+    status_exclude: list = None,
+    filtered_rows: list = None
 ) -> dict:
     """
     Processa dados da planilha para criar estrutura hierárquica:
@@ -852,111 +1411,65 @@ def process_enel_legalizacao_data(
         status_column: Nome da coluna de status
         years: Lista de anos para processar
         filter_natureza: Valor para filtrar na coluna 'Relatório Natureza da Operação' (opcional)
+        filtered_rows: Linhas já pré-filtradas por quem chama (opcional); cabeçalhos e validações continuam vindo de data
     """
     headers = data.get('headers', [])
-    rows = data.get('values', [])
+    if filtered_rows is None:
+        has_rows, rows = _peek_rows(data.get('values', []))
+    else:
+        # Linhas já separadas pelo chamador a partir de uma planilha com dados
+        has_rows, rows = True, filtered_rows
     
-    if not headers or not rows:
-        return {
-            'total_demandado': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 100.0},
-            'concluidos': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-            'em_andamento': {
-                'total': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                'subcategorias': []
-            }
-        }
+    if not headers or not has_rows:
+        return _empty_result(years)
     
-    # Encontrar índice da coluna de status (case-insensitive, com trim)
-    status_col_idx = None
-    status_column_normalized = status_column.strip().lower()
-    for idx, header in enumerate(headers):
-        if header.strip().lower() == status_column_normalized:
-            status_col_idx = idx
-            break
+    header_idx = _header_index(headers)
     
+    # Encontrar índice da coluna de status
+    status_col_idx = header_idx.get(status_column.strip().lower())
     if status_col_idx is None:
         logger.error(f"Coluna '{status_column}' não encontrada. Colunas disponíveis: {headers}")
         # Retornar dados vazios com informações sobre colunas disponíveis
-        return {
-            'total_demandado': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 100.0},
-            'concluidos': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-            'em_andamento': {
-                'total': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                'subcategorias': []
-            },
-            'warning': f"Coluna '{status_column}' não encontrada",
-            'available_columns': headers,
-            'requested_column': status_column
-        }
+        return _empty_result(
+            years, f"Coluna '{status_column}' não encontrada", headers,
+            requested_column=status_column
+        )
     
     # Encontrar índice da coluna de ano (default: 'ano Acionamento')
     year_column_name = year_column_name or 'ano Acionamento'
-    year_col_idx = None
-    for idx, header in enumerate(headers):
-        if header.strip().lower() == year_column_name.lower():
-            year_col_idx = idx
-            break
-    
+    year_col_idx = header_idx.get(year_column_name.lower())
     if year_col_idx is None:
         logger.warning(f"Coluna '{year_column_name}' não encontrada. Colunas disponíveis: {headers}")
         # Se não encontrar a coluna de ano, retornar dados vazios com informações
-        return {
-            'total_demandado': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 100.0},
-            'concluidos': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-            'em_andamento': {
-                'total': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                'subcategorias': []
-            },
-            'warning': f"Coluna '{year_column_name}' não encontrada",
-            'available_columns': headers,
-            'requested_year_column': year_column_name
-        }
+        return _empty_result(
+            years, f"Coluna '{year_column_name}' não encontrada", headers,
+            requested_year_column=year_column_name
+        )
     
     # Encontrar índice da coluna 'Relatório Natureza da Operação' se filtro for necessário
     natureza_col_idx = None
     if filter_natureza:
-        natureza_column_name = 'Relatório Natureza da Operação'
-        
-        for idx, header in enumerate(headers):
-            if header.strip().lower() == natureza_column_name.lower():
-                natureza_col_idx = idx
-                break
+        natureza_column_name = _NATUREZA_COLUMN
+        natureza_col_idx = header_idx.get(natureza_column_name.lower())
         
         if natureza_col_idx is None:
             logger.warning(f"Coluna '{natureza_column_name}' não encontrada para filtro. Colunas disponíveis: {headers}")
             
             # Se não encontrar a coluna de natureza, retornar dados vazios com informações
-            return {
-                'total_demandado': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 100.0},
-                'concluidos': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                'em_andamento': {
-                    'total': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                    'subcategorias': []
-                },
-                'warning': f"Coluna '{natureza_column_name}' não encontrada para filtro",
-                'available_columns': headers,
-                'requested_natureza_column': natureza_column_name
-            }
+            return _empty_result(
+                years, f"Coluna '{natureza_column_name}' não encontrada para filtro", headers,
+                requested_natureza_column=natureza_column_name
+            )
     
     # Encontrar índice da coluna 'Item' se filtro for necessário
     item_col_idx = None
     if item_column:
-        for idx, header in enumerate(headers):
-            if header.strip().lower() == item_column.strip().lower():
-                item_col_idx = idx
-                break
+        item_col_idx = header_idx.get(item_column.strip().lower())
         if item_col_idx is None:
-            return {
-                'total_demandado': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 100.0},
-                'concluidos': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                'em_andamento': {
-                    'total': {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0},
-                    'subcategorias': []
-                },
-                'warning': f"Coluna '{item_column}' não encontrada",
-                'available_columns': headers,
-                'requested_item_column': item_column
-            }
+            return _empty_result(
+                years, f"Coluna '{item_column}' não encontrada", headers,
+                requested_item_column=item_column
+            )
 
     
     # Normalizações de status para filtros/agrupamentos
@@ -970,195 +1483,68 @@ def process_enel_legalizacao_data(
     if status_exclude:
         status_exclude_normalized = {' '.join(v.split()).lower() for v in status_exclude if isinstance(v, str)}
 
-    # Processar linhas
-    status_counts = {}
-    total_by_year = {year: 0 for year in years}
-    total_all = 0
-    
-    # Coletar valores únicos de natureza para debug
-    natureza_values_set = set()
-    rows_before_filter = 0
-    rows_after_filter = 0
-    rows_filtered_out = 0
-    rows_skipped_empty_status = 0
-    rows_skipped_empty_year = 0
-    rows_skipped_year_parse = 0
-    rows_skipped_year_not_in_range = 0
-    status_value_samples = []
-    year_value_samples = []
-    for row in rows:
-        rows_before_filter += 1
-        
-        # Verificar se a linha tem colunas suficientes
-        required_indices = [status_col_idx, year_col_idx]
-        if natureza_col_idx is not None:
-            required_indices.append(natureza_col_idx)
-        if item_col_idx is not None:
-            required_indices.append(item_col_idx)
-        if len(row) <= max(required_indices):
-            continue
-        
-        # Aplicar filtro de item (ex: Item != 53)
-        if item_col_idx is not None and item_not_equals is not None:
-            item_value = row[item_col_idx] if item_col_idx < len(row) else ""
-            item_value_str = str(item_value).strip()
-            compare_value_str = str(item_not_equals).strip()
-            
-            def _values_equal(left, right):
-                try:
-                    return float(left) == float(right)
-                except (ValueError, TypeError):
-                    return left.strip().lower() == right.strip().lower()
-            
-            if _values_equal(item_value_str, compare_value_str):
-                continue
-        
-        # Aplicar filtro de natureza da operação se necessário
-        if filter_natureza and natureza_col_idx is not None:
-            natureza_value = str(row[natureza_col_idx]).strip() if natureza_col_idx < len(row) else ""
-            
-            # Coletar valores únicos para debug
-            if natureza_value:
-                natureza_values_set.add(natureza_value)
-            
-            # Comparar valores (case-insensitive, com normalização de espaços)
-            natureza_value_normalized = ' '.join(natureza_value.split()).lower()
-            filter_natureza_normalized = ' '.join(filter_natureza.split()).lower()
-            match = natureza_value_normalized == filter_natureza_normalized
-            
-            if not match:
-                rows_filtered_out += 1
-                continue  # Pular linhas que não correspondem ao filtro
-        
-        rows_after_filter += 1
-        
-        # Obter status
-        status_value = row[status_col_idx].strip() if status_col_idx < len(row) else ""
-        if not status_value:
-            rows_skipped_empty_status += 1
-            continue
-        if len(status_value_samples) < 5:
-            status_value_samples.append(status_value)
-
-        # Normalizar status e aplicar exclusões, se houver
-        status_normalized = ' '.join(status_value.split()).lower()
-        if status_exclude_normalized and status_normalized in status_exclude_normalized:
-            continue
-        
-        # Obter ano da coluna configurada
-        year_value_str = str(row[year_col_idx]).strip() if year_col_idx < len(row) else ""
-        if not year_value_str:
-            rows_skipped_empty_year += 1
-            continue  # Pular linhas sem ano
-        if len(year_value_samples) < 5:
-            year_value_samples.append({
-                'raw': row[year_col_idx],
-                'type': type(row[year_col_idx]).__name__,
-                'str': year_value_str
-            })
-        
-        # Interpretar ano conforme modo
-        if year_parse_mode == 'last4':
-            if year_value_str.lower() == 'não acionado':
-                continue
-            if len(year_value_str) < 4:
-                continue
-            year_suffix = year_value_str[-4:]
-            if year_suffix.isdigit():
-                row_year = int(year_suffix)
-            else:
-                # Tentar extrair ano dentro de strings com data/hora (ex: "2024-07-22 00:00:00")
-                year_match = re.search(r'(19|20)\d{2}', year_value_str)
-                if not year_match:
-                    continue
-                row_year = int(year_match.group(0))
-        elif year_parse_mode == 'extract_year':
-            year_match = re.search(r'(19|20)\d{2}', year_value_str)
-            if not year_match:
-                rows_skipped_year_parse += 1
-                continue
-            row_year = int(year_match.group(0))
-        else:
-            # Tentar converter o ano para inteiro (pode vir como float string "2024.0")
-            try:
-                # Primeiro tentar converter para float e depois para int (para tratar "2024.0")
-                row_year = int(float(year_value_str))
-            except (ValueError, TypeError):
-                # Se não conseguir converter, pular a linha
-                rows_skipped_year_parse += 1
-                continue
-        
-        # Verificar se o ano está na lista de anos solicitados
-        if row_year not in years:
-            rows_skipped_year_not_in_range += 1
-            continue  # Pular anos fora do range solicitado
-        
-        if status_normalized not in status_counts:
-            status_counts[status_normalized] = {
-                'original': status_value,  # Manter original para exibição
-                'years': {year: 0 for year in years},
-                'total': 0
-            }
-        
-        # Contar esta linha para o ano correspondente
-        status_counts[status_normalized]['years'][row_year] += 1
-        total_by_year[row_year] += 1
-        status_counts[status_normalized]['total'] += 1
-        total_all += 1
-    
-    
-    # Separar Concluídos e outros status
-    concluidos_normalized = 'concluído'
-    concluidos_data = {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0}
-    cancelados_data = {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0}
-    em_andamento_subcategorias = []
-    
-    for status_norm, status_info in status_counts.items():
-        if concluido_values_normalized is not None:
-            is_concluido = status_norm in concluido_values_normalized
-        else:
-            is_concluido = concluidos_normalized in status_norm
-        if cancelado_values_normalized is not None:
-            is_cancelado = status_norm in cancelado_values_normalized
-        else:
-            is_cancelado = False
-        if is_concluido:
-            # É concluído
-            for year in years:
-                concluidos_data['years'][year] += status_info['years'][year]
-            concluidos_data['total'] += status_info['total']
-        elif is_cancelado:
-            for year in years:
-                cancelados_data['years'][year] += status_info['years'][year]
-            cancelados_data['total'] += status_info['total']
-        else:
-            # É subcategoria de "Alvarás em andamento"
-            subcat = {
-                'name': status_info['original'],
-                'years': status_info['years'].copy(),
-                'total': status_info['total'],
-                'percentage': 0.0
-            }
-            em_andamento_subcategorias.append(subcat)
+    # Processar linhas (contagem vetorizada por status e ano)
+    year_keys = list(dict.fromkeys(years))
+    status_names, originals, counts, total_by_year, total_all = _count_status_years(
+        rows,
+        status_col_idx, year_col_idx, natureza_col_idx, item_col_idx,
+        year_keys, year_parse_mode, filter_natureza, item_not_equals, status_exclude_normalized
+    )
+    
+    # Classificar os status distintos de uma vez (máscaras sobre as linhas da matriz counts).
+    # Sem lista configurada, mantém a busca por substring: "Processo concluído" continua em Concluídos.
+    status_series = pd.Series(status_names, dtype=object)
+    if concluido_values_normalized is not None:
+        is_concluido = status_series.isin(concluido_values_normalized).to_numpy(dtype=bool)
+    else:
+        is_concluido = status_series.str.contains('concluído', regex=False).to_numpy(dtype=bool)
+    if cancelado_values_normalized:
+        is_cancelado = ~is_concluido & status_series.isin(cancelado_values_normalized).to_numpy(dtype=bool)
+    else:
+        is_cancelado = np.zeros(len(status_names), dtype=bool)
+    is_em_andamento = ~(is_concluido | is_cancelado)
+    
+    concluidos_data = _sum_year_counts(year_keys, counts[is_concluido])
+    cancelados_data = _sum_year_counts(year_keys, counts[is_cancelado])
     
     # Calcular total de "Alvarás em andamento"
-    em_andamento_total = {'years': {y: 0 for y in years}, 'total': 0, 'percentage': 0.0}
-    for subcat in em_andamento_subcategorias:
-        for year in years:
-            em_andamento_total['years'][year] += subcat['years'][year]
-        em_andamento_total['total'] += subcat['total']
+    em_andamento_counts = counts[is_em_andamento]
+    em_andamento_total = _sum_year_counts(year_keys, em_andamento_counts)
     
-    # Calcular percentuais
+    # Percentuais em uma divisão vetorizada (mesma ordem de operações de (total / total_all) * 100)
+    em_andamento_totals = em_andamento_counts.sum(axis=1)
+    group_totals = np.array([concluidos_data['total'], cancelados_data['total'], em_andamento_total['total']])
     if total_all > 0:
-        concluidos_data['percentage'] = (concluidos_data['total'] / total_all) * 100
-        cancelados_data['percentage'] = (cancelados_data['total'] / total_all) * 100
-        em_andamento_total['percentage'] = (em_andamento_total['total'] / total_all) * 100
-        for subcat in em_andamento_subcategorias:
-            subcat['percentage'] = (subcat['total'] / total_all) * 100
+        group_percentages = ((group_totals / total_all) * 100).tolist()
+        subcat_percentages = ((em_andamento_totals / total_all) * 100).tolist()
+    else:
+        group_percentages = [0.0] * len(group_totals)
+        subcat_percentages = [0.0] * len(em_andamento_totals)
+    (
+        concluidos_data['percentage'],
+        cancelados_data['percentage'],
+        em_andamento_total['percentage']
+    ) = group_percentages
+    
+    # Subcategorias de "Alvarás em andamento" (demais status): uma linha da matriz por status
+    em_andamento_subcategorias = [
+        {
+            'name': original,
+            'years': dict(zip(year_keys, status_years)),
+            'total': status_total,
+            'percentage': percentage
+        }
+        for original, status_years, status_total, percentage in zip(
+            originals[is_em_andamento].tolist(),
+            em_andamento_counts.tolist(),
+            em_andamento_totals.tolist(),
+            subcat_percentages
+        )
+    ]
     
     return {
         'total_demandado': {
-            'years': total_by_year.copy(),
+            'years': dict(zip(year_keys, total_by_year.tolist())),
             'total': total_all,
             'percentage': 100.0
         },
@@ -1170,3 +1556,66 @@ def process_enel_legalizacao_data(
         },
         'years': years
     }
+
+
+def process_enel_legalizacao_data_by_natureza(
+    data: dict,
+    status_column: str,
+    years: list,
+    natureza_values: list,
+    **options
+) -> dict:
+    """
+    Processa a mesma planilha para vários valores de 'Relatório Natureza da Operação' com uma
+    única passada pelas linhas (em vez de uma leitura/varredura completa por natureza).
+    
+    Args:
+        data: Dados da planilha
+        status_column: Nome da coluna de status
+        years: Lista de anos para processar
+        natureza_values: Valores de natureza a processar
+        **options: Demais parâmetros de process_enel_legalizacao_data
+    
+    Returns:
+        Dict {natureza: resultado de process_enel_legalizacao_data com filter_natureza=natureza}
+    """
+    headers = data.get('headers', [])
+    has_rows, rows = _peek_rows(data.get('values', []))
+    
+    natureza_col_idx = _header_index(headers).get(_NATUREZA_COLUMN.lower())
+    
+    if not has_rows or natureza_col_idx is None:
+        # Sem linhas ou sem a coluna de natureza: o processamento individual já monta o retorno vazio/aviso
+        # (linhas materializadas: um iterador não pode ser repassado a várias chamadas)
+        data = {**data, 'values': list(rows)}
+        return {
+            natureza: process_enel_legalizacao_data(data, status_column, years, filter_natureza=natureza, **options)
+            for natureza in natureza_values
+        }
+    
+    # Separar as linhas por natureza normalizada em uma única passada; cada valor distinto da
+    # célula é normalizado uma só vez (bucket_by_value), não a cada linha
+    normalized_by_natureza = {natureza: ' '.join(natureza.split()).lower() for natureza in natureza_values}
+    rows_by_natureza = {normalized: [] for normalized in normalized_by_natureza.values()}
+    bucket_by_value = {}
+    for row in rows:
+        if len(row) > natureza_col_idx:
+            value = row[natureza_col_idx]
+            try:
+                bucket = bucket_by_value[value]
+            except KeyError:
+                bucket = bucket_by_value[value] = rows_by_natureza.get(' '.join(str(value).split()).lower())
+            if bucket is not None:
+                bucket.append(row)
+    
+    # Cada grupo já está filtrado: processar sem repetir a comparação de natureza
+    return {
+        natureza: process_enel_legalizacao_data(
+            data,
+            status_column,
+            years,
+            filtered_rows=rows_by_natureza[normalized_by_natureza[natureza]],
+            **options
+        )
+        for natureza in natureza_values
+    }
@@ -4,16 +4,75 @@ Módulo de integração com Google Sheets API
 import os
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from typing import Dict, List, Optional, Any
+import numpy as np
+import pandas as pd
+import httplib2
+import google_auth_httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
-# Cache do cliente para evitar múltiplas inicializações
-_sheets_client = None
+# orjson (opcional) decodifica direto de bytes e é mais rápido nas respostas grandes de
+# valores. orjson.JSONDecodeError é subclasse de json.JSONDecodeError.
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+
+class _FastJsonModel(JsonModel):
+    """JsonModel do googleapiclient com a decodificação das respostas feita por _json_loads."""
+    
+    def deserialize(self, content):
+        # Mesmo comportamento do JsonModel: conteúdo que não é JSON é devolvido como veio
+        try:
+            body = _json_loads(content)
+        except json.JSONDecodeError:
+            return content.decode('utf-8') if isinstance(content, bytes) else content
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
+
+# Cache dos clientes por arquivo de credenciais para evitar múltiplas inicializações
+# (o lock impede que threads concorrentes montem o mesmo cliente mais de uma vez)
+_sheets_clients: Dict[str, Any] = {}
+_sheets_credentials: Dict[str, Any] = {}
+_sheets_client_lock = threading.Lock()
+
+# Resultados recentes de get_spreadsheet_data (chave -> (expira_em, dados congelados em tuplas))
+_data_cache: Dict[tuple, tuple] = {}
+_data_cache_lock = threading.Lock()
+_DATA_CACHE_MAXSIZE = 128
+
+# Conexões HTTP por thread: httplib2.Http não é thread-safe, então cada thread reaproveita
+# a sua (keep-alive, sem novo handshake TLS a cada chamada) em vez de compartilhar a do cliente
+_thread_http = threading.local()
+
+# Leituras simultâneas de get_multiple_spreadsheets_data: um pool por processo, criado uma vez
+# (as threads só nascem no primeiro submit, depois do fork dos workers do gunicorn)
+_SHEETS_FETCH_MAX_WORKERS = 8
+_sheets_fetch_executor = ThreadPoolExecutor(
+    max_workers=_SHEETS_FETCH_MAX_WORKERS, thread_name_prefix='sheets-fetch'
+)
+
+# Título da primeira aba por spreadsheet_id (spreadsheet_id -> (expira_em, título)); evita a
+# chamada de metadados a cada leitura. Expira como _data_cache (GOOGLE_SHEETS_CACHE_TTL), para
+# que abas renomeadas ou reordenadas sejam percebidas, e sai em qualquer HttpError da planilha
+_sheet_title_cache: Dict[str, tuple] = {}
+_sheet_title_lock = threading.Lock()
+_SHEET_TITLE_CACHE_MAXSIZE = 128
 
 def get_sheets_client(credentials_path: str):
     """
@@ -29,25 +88,150 @@ def get_sheets_client(credentials_path: str):
         FileNotFoundError: Se o arquivo de credenciais não existir
         ValueError: Se as credenciais forem inválidas
     """
-    global _sheets_client
+    sheets_client = _sheets_clients.get(credentials_path)
+    if sheets_client is not None:
+        return sheets_client
     
-    if _sheets_client is not None:
-        return _sheets_client
+    with _sheets_client_lock:
+        # Outra thread pode ter inicializado o cliente enquanto esta aguardava o lock
+        sheets_client = _sheets_clients.get(credentials_path)
+        if sheets_client is not None:
+            return sheets_client
+        
+        if not os.path.exists(credentials_path):
+            raise FileNotFoundError(f"Arquivo de credenciais não encontrado: {credentials_path}")
+        
+        try:
+            credentials = service_account.Credentials.from_service_account_file(
+                credentials_path,
+                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
+            )
+            # Documento de descoberta empacotado na biblioteca: sem download nem cache em disco
+            sheets_client = build(
+                'sheets', 'v4',
+                credentials=credentials,
+                model=_FastJsonModel() if ORJSON_AVAILABLE else None,
+                cache_discovery=False,
+                static_discovery=True
+            )
+            _sheets_credentials[credentials_path] = credentials
+            _sheets_clients[credentials_path] = sheets_client
+            logger.info(f"Cliente Google Sheets inicializado com sucesso")
+            return sheets_client
+        except Exception as e:
+            logger.error(f"Erro ao inicializar cliente Google Sheets: {str(e)}")
+            raise ValueError(f"Erro ao carregar credenciais: {str(e)}")
+
+
+def _authorized_http(credentials_path: str):
+    """
+    Retorna o AuthorizedHttp da thread atual para as credenciais (criado na primeira chamada
+    da thread e reaproveitado nas seguintes). Requer get_sheets_client chamado antes.
+    """
+    https = getattr(_thread_http, 'by_credentials', None)
+    if https is None:
+        https = _thread_http.by_credentials = {}
+    http = https.get(credentials_path)
+    if http is None:
+        http = google_auth_httplib2.AuthorizedHttp(
+            _sheets_credentials[credentials_path], http=httplib2.Http()
+        )
+        https[credentials_path] = http
+    return http
+
+
+def _first_sheet_title(service, spreadsheet_id: str, http=None) -> str:
+    """
+    Retorna o título da primeira aba, consultando a API no máximo uma vez por planilha a cada
+    GOOGLE_SHEETS_CACHE_TTL segundos (0 desativa o cache; a resposta traz apenas os títulos).
+    """
+    from . import config
+    ttl = config.GOOGLE_SHEETS_CACHE_TTL
+    with _sheet_title_lock:
+        entry = _sheet_title_cache.get(spreadsheet_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                return entry[1]
+            del _sheet_title_cache[spreadsheet_id]
     
-    if not os.path.exists(credentials_path):
-        raise FileNotFoundError(f"Arquivo de credenciais não encontrado: {credentials_path}")
+    spreadsheet_metadata = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties.title'
+    ).execute(http=http)
+    sheets = spreadsheet_metadata.get('sheets', [])
+    if not sheets:
+        raise ValueError("Planilha não possui abas")
+    sheet_title = sheets[0]['properties']['title']
     
-    try:
-        credentials = service_account.Credentials.from_service_account_file(
-            credentials_path,
-            scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
+    if ttl > 0:
+        with _sheet_title_lock:
+            _sheet_title_cache.pop(spreadsheet_id, None)
+            while len(_sheet_title_cache) >= _SHEET_TITLE_CACHE_MAXSIZE:
+                # Ordem de inserção: a entrada mais antiga sai primeiro
+                del _sheet_title_cache[next(iter(_sheet_title_cache))]
+            _sheet_title_cache[spreadsheet_id] = (time.monotonic() + ttl, sheet_title)
+    return sheet_title
+
+
+# Conteúdo (bytes) dos HttpError relançados para 403/404
+_ACCESS_DENIED_CONTENT = "Acesso negado. Compartilhe a planilha com: google-sheets-service@mr-consultoria-reports-app.iam.gserviceaccount.com".encode('utf-8')
+_NOT_FOUND_CONTENT = "Planilha não encontrada. Verifique o ID da planilha.".encode('utf-8')
+
+
+def _raise_http_error(e: HttpError, spreadsheet_id: str):
+    """Registra o erro da API e relança com mensagem amigável para 403/404."""
+    # O título em cache pode estar desatualizado (aba renomeada gera 400 "Unable to parse
+    # range", planilha removida gera 404): a próxima leitura consulta os metadados de novo
+    with _sheet_title_lock:
+        _sheet_title_cache.pop(spreadsheet_id, None)
+    
+    if e.resp.status == 403:
+        logger.error(f"Acesso negado à planilha {spreadsheet_id}. Verifique se a planilha está compartilhada com o service account.")
+        raise HttpError(
+            resp=e.resp,
+            content=_ACCESS_DENIED_CONTENT
         )
-        _sheets_client = build('sheets', 'v4', credentials=credentials)
-        logger.info(f"Cliente Google Sheets inicializado com sucesso")
-        return _sheets_client
-    except Exception as e:
-        logger.error(f"Erro ao inicializar cliente Google Sheets: {str(e)}")
-        raise ValueError(f"Erro ao carregar credenciais: {str(e)}")
+    elif e.resp.status == 404:
+        logger.error(f"Planilha {spreadsheet_id} não encontrada")
+        raise HttpError(
+            resp=e.resp,
+            content=_NOT_FOUND_CONTENT
+        )
+    else:
+        # Payload decodificado (direto dos bytes) só aqui, onde a mensagem é usada
+        try:
+            error_message = _json_loads(e.content).get('error', {}).get('message', str(e))
+        except (json.JSONDecodeError, AttributeError):
+            error_message = str(e)
+        logger.error(f"Erro ao buscar dados da planilha: {error_message}")
+        raise e
+
+
+def _cached_data(key: tuple) -> Optional[Dict[str, Any]]:
+    """Dados em cache ainda válidos para a chave (cópia rasa; linhas continuam tuplas) ou None."""
+    with _data_cache_lock:
+        entry = _data_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, frozen = entry
+        if expires_at <= time.monotonic():
+            del _data_cache[key]
+            return None
+    headers, values, extra = frozen
+    return {'values': values, 'headers': list(headers), **extra}
+
+
+def _store_data(key: tuple, data: Dict[str, Any], ttl: int) -> Dict[str, Any]:
+    """Congela os dados em tuplas (imutáveis, seguros entre threads), guarda e devolve a versão em cache."""
+    extra = {k: v for k, v in data.items() if k not in ('values', 'headers')}
+    frozen = (tuple(data['headers']), tuple(map(tuple, data['values'])), extra)
+    with _data_cache_lock:
+        _data_cache.pop(key, None)
+        while len(_data_cache) >= _DATA_CACHE_MAXSIZE:
+            # Dicionário mantém ordem de inserção: a entrada mais antiga sai primeiro
+            del _data_cache[next(iter(_data_cache))]
+        _data_cache[key] = (time.monotonic() + ttl, frozen)
+    return {'values': frozen[1], 'headers': list(frozen[0]), **extra}
 
 
 def get_spreadsheet_data(
@@ -59,6 +243,9 @@ def get_spreadsheet_data(
     """
     Busca dados de uma planilha Google Sheets
     
+    O resultado fica em cache por GOOGLE_SHEETS_CACHE_TTL segundos (0 desativa), por planilha,
+    aba, range e credenciais; as linhas são devolvidas como tuplas.
+    
     Args:
         spreadsheet_id: ID da planilha (da URL: .../d/{SPREADSHEET_ID}/...)
         sheet_name: Nome da aba (se None, usa a primeira aba)
@@ -66,27 +253,85 @@ def get_spreadsheet_data(
         credentials_path: Caminho para credenciais (usa config se None)
         
     Returns:
-        Dicionário com 'values' (lista de linhas) e 'headers' (primeira linha)
+        Dicionário com 'values' (linhas) e 'headers' (primeira linha)
         
     Raises:
         HttpError: Se houver erro na API (planilha não compartilhada, etc.)
     """
+    from . import config
     if credentials_path is None:
-        from . import config
         credentials_path = config.GOOGLE_SERVICE_ACCOUNT_FILE
     
+    ttl = config.GOOGLE_SHEETS_CACHE_TTL
+    if ttl <= 0:
+        return _fetch_spreadsheet_data(spreadsheet_id, sheet_name, range_name, credentials_path)
+    
+    key = (spreadsheet_id, sheet_name, range_name, credentials_path)
+    data = _cached_data(key)
+    if data is None:
+        data = _store_data(
+            key,
+            _fetch_spreadsheet_data(spreadsheet_id, sheet_name, range_name, credentials_path),
+            ttl
+        )
+    return data
+
+
+def get_multiple_spreadsheets_data(
+    spreadsheet_ids: List[str],
+    sheet_name: Optional[str] = None,
+    range_name: Optional[str] = None,
+    credentials_path: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca várias planilhas em paralelo (a latência de cada chamada à API se sobrepõe)
+    
+    As leituras rodam no pool do módulo (até _SHEETS_FETCH_MAX_WORKERS simultâneas); cada
+    thread usa a sua própria conexão HTTP autorizada e o cache de get_spreadsheet_data
+    continua valendo para cada planilha.
+    
+    Args:
+        spreadsheet_ids: IDs das planilhas
+        sheet_name: Nome da aba em todas as planilhas (se None, usa a primeira aba de cada)
+        range_name: Range específico aplicado a todas as planilhas
+        credentials_path: Caminho para credenciais (usa config se None)
+        
+    Returns:
+        Dicionário spreadsheet_id -> resultado de get_spreadsheet_data
+        
+    Raises:
+        HttpError: Primeiro erro da API encontrado (na ordem de spreadsheet_ids)
+    """
+    unique_ids = list(dict.fromkeys(spreadsheet_ids))
+    if len(unique_ids) <= 1:
+        return {
+            spreadsheet_id: get_spreadsheet_data(spreadsheet_id, sheet_name, range_name, credentials_path)
+            for spreadsheet_id in unique_ids
+        }
+    
+    futures = {
+        spreadsheet_id: _sheets_fetch_executor.submit(
+            get_spreadsheet_data, spreadsheet_id, sheet_name, range_name, credentials_path
+        )
+        for spreadsheet_id in unique_ids
+    }
+    return {spreadsheet_id: future.result() for spreadsheet_id, future in futures.items()}
+
+
+def _fetch_spreadsheet_data(
+    spreadsheet_id: str,
+    sheet_name: Optional[str],
+    range_name: Optional[str],
+    credentials_path: str
+) -> Dict[str, Any]:
+    """Busca os dados na API (sem cache); mesmo retorno de get_spreadsheet_data, com listas."""
     try:
         service = get_sheets_client(credentials_path)
+        http = _authorized_http(credentials_path)
         
-        # Se sheet_name não foi fornecido, buscar primeira aba
+        # Se sheet_name não foi fornecido, usar a primeira aba (título em cache)
         if sheet_name is None:
-            spreadsheet_metadata = service.spreadsheets().get(
-                spreadsheetId=spreadsheet_id
-            ).execute()
-            sheets = spreadsheet_metadata.get('sheets', [])
-            if not sheets:
-                raise ValueError("Planilha não possui abas")
-            sheet_name = sheets[0]['properties']['title']
+            sheet_name = _first_sheet_title(service, spreadsheet_id, http)
             logger.info(f"Usando primeira aba: {sheet_name}")
         
         # Construir range
@@ -95,11 +340,15 @@ def get_spreadsheet_data(
         else:
             range_full = sheet_name
         
-        # Buscar dados
+        # Buscar dados (valores não formatados: números chegam como int/float, sem texto a converter;
+        # a resposta traz só 'values')
         result = service.spreadsheets().values().get(
             spreadsheetId=spreadsheet_id,
-            range=range_full
-        ).execute()
+            range=range_full,
+            fields='values',
+            valueRenderOption='UNFORMATTED_VALUE',
+            dateTimeRenderOption='SERIAL_NUMBER'
+        ).execute(http=http)
         
         values = result.get('values', [])
         
@@ -120,30 +369,249 @@ def get_spreadsheet_data(
         }
         
     except HttpError as e:
-        error_details = json.loads(e.content.decode('utf-8'))
-        error_message = error_details.get('error', {}).get('message', str(e))
+        _raise_http_error(e, spreadsheet_id)
+    
+    except Exception as e:
+        logger.error(f"Erro inesperado ao buscar dados: {str(e)}")
+        raise
+
+
+def _a1_sheet(sheet_name: str) -> str:
+    """Nome da aba entre aspas simples para notação A1 (aspas internas duplicadas)."""
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def get_spreadsheets_data_batch(
+    spreadsheet_id: str,
+    ranges: List[str],
+    credentials_path: Optional[str] = None
+) -> Dict[str, List[List[Any]]]:
+    """
+    Busca vários ranges da mesma planilha em uma única requisição (values.batchGet)
+    
+    Args:
+        spreadsheet_id: ID da planilha (da URL: .../d/{SPREADSHEET_ID}/...)
+        ranges: Ranges em notação A1 (ex: ["'Aba 1'!A1:Z1000", "Aba2"])
+        credentials_path: Caminho para credenciais (usa config se None)
         
-        if e.resp.status == 403:
-            logger.error(f"Acesso negado à planilha {spreadsheet_id}. Verifique se a planilha está compartilhada com o service account.")
-            raise HttpError(
-                resp=e.resp,
-                content=f"Acesso negado. Compartilhe a planilha com: google-sheets-service@mr-consultoria-reports-app.iam.gserviceaccount.com".encode('utf-8')
-            )
-        elif e.resp.status == 404:
-            logger.error(f"Planilha {spreadsheet_id} não encontrada")
-            raise HttpError(
-                resp=e.resp,
-                content=f"Planilha não encontrada. Verifique o ID da planilha.".encode('utf-8')
-            )
-        else:
-            logger.error(f"Erro ao buscar dados da planilha: {error_message}")
-            raise
+    Returns:
+        Dicionário range solicitado -> lista de linhas (valores não formatados)
+        
+    Raises:
+        HttpError: Se houver erro na API (planilha não compartilhada, etc.)
+    """
+    if credentials_path is None:
+        from . import config
+        credentials_path = config.GOOGLE_SERVICE_ACCOUNT_FILE
+    
+    if not ranges:
+        return {}
+    
+    try:
+        service = get_sheets_client(credentials_path)
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=list(ranges),
+            fields='valueRanges(values)',
+            valueRenderOption='UNFORMATTED_VALUE'
+        ).execute(http=_authorized_http(credentials_path))
+        
+        # valueRanges vem na mesma ordem dos ranges solicitados
+        value_ranges = result.get('valueRanges', [])
+        return {
+            range_name: value_range.get('values', [])
+            for range_name, value_range in zip(ranges, value_ranges)
+        }
+        
+    except HttpError as e:
+        _raise_http_error(e, spreadsheet_id)
     
     except Exception as e:
         logger.error(f"Erro inesperado ao buscar dados: {str(e)}")
         raise
 
 
+def _map_unique(values: pd.Series, func) -> np.ndarray:
+    """
+    Aplica func uma vez por valor distinto de values e devolve o resultado alinhado às linhas
+    (valores iguais em Python, como 1, 1.0 e True, compartilham o mesmo resultado).
+    Valores ausentes (None/NaN) recebem func(None).
+    """
+    codes, uniques = pd.factorize(values)
+    # Código -1 (ausente) aponta para o último elemento
+    return np.asarray([func(value) for value in uniques] + [func(None)], dtype=object)[codes]
+
+
+# Tipos inferidos de colunas só com números nativos (e células vazias)
+_NUMERIC_INFERRED = frozenset({'integer', 'floating', 'mixed-integer-float', 'empty'})
+
+
+def _convert_cells(values: pd.Series, func, numeric_func) -> np.ndarray:
+    """
+    Converte uma coluna para float, com NaN para célula vazia ou inválida.
+    
+    Coluna só com números nativos (UNFORMATTED_VALUE) e vazios é convertida em uma passada
+    (pd.to_numeric + numeric_func, equivalente vetorizado de func); se houver texto, func é
+    aplicada uma vez por valor distinto.
+    """
+    cells = values.to_numpy(dtype=object)
+    inferred = pd.api.types.infer_dtype(cells, skipna=True)
+    if inferred == 'mixed':
+        # Números misturados com células vazias ('')
+        cells = np.where(cells == '', None, cells)
+        inferred = pd.api.types.infer_dtype(cells, skipna=True)
+    if inferred in _NUMERIC_INFERRED:
+        return numeric_func(pd.to_numeric(cells).astype(float))
+    return _map_unique(
+        values,
+        lambda v: np.nan if pd.isna(v) or (result := func(v)) is None else result
+    ).astype(float)
+
+
+def _cell_int(value) -> Optional[int]:
+    """
+    Inteiro de uma célula: números (UNFORMATTED_VALUE) são usados direto e texto passa por int().
+    Retorna None para célula vazia ou inválida (inclusive booleano, que formatado era "TRUE").
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _cell_percentage(value) -> Optional[float]:
+    """
+    Percentual de uma célula: número (UNFORMATTED_VALUE de célula com formato %, ex: 0.25) é
+    escalado por 100; texto ("25%", "25,5 %", "25") é usado como está. Retorna None se vazio,
+    booleano ou inválido.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * 100
+    try:
+        return float(value.replace('%', '').replace(',', '.').strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def _ordered_statuses(config_statuses: List[Dict[str, Any]], status_counts, exclude=frozenset()) -> List[Dict[str, Any]]:
+    """
+    Monta a lista de status encontrados na ordem da configuração, usando o display_name da
+    primeira entrada de cada sheet_value (tabela de consulta montada uma vez).
+    status_counts(sheet_value) retorna years/total/percentage do status ou None se ausente.
+    """
+    config_by_value = {}
+    for config_status in config_statuses:
+        config_by_value.setdefault(config_status['sheet_value'], config_status)
+    
+    ordered = []
+    for config_status in config_statuses:
+        status_value = config_status['sheet_value']
+        if status_value in exclude:
+            continue
+        counts = status_counts(status_value)
+        if counts is None:
+            continue
+        ordered.append({
+            'name': config_by_value[status_value]['display_name'],
+            'sheet_value': status_value,
+            'years': counts['years'],
+            'total': counts['total'],
+            'percentage': counts['percentage']
+        })
+    return ordered
+
+
+def _last_valid(codes: np.ndarray, values, n_codes: int) -> np.ndarray:
+    """Último valor não-NaN de cada código (NaN se o código não tem nenhum)."""
+    result = np.full(n_codes, np.nan)
+    values = np.broadcast_to(np.asarray(values, dtype=float), codes.shape)
+    valid_pos = np.flatnonzero(~np.isnan(values))[::-1]
+    # Com as posições invertidas, a primeira ocorrência de cada código é a última linha válida
+    valid_codes, first = np.unique(codes[valid_pos], return_index=True)
+    result[valid_codes] = values[valid_pos[first]]
+    return result
+
+
+def _aggregate_rows(
+    rows,
+    status_col_idx: int,
+    year_columns: Dict[int, int],
+    year_keys: List[int],
+    years: List[int],
+    total_col_idx: Optional[int],
+    percentage_col_idx: Optional[int],
+    include_blank: bool,
+    wanted_statuses: frozenset
+) -> tuple:
+    """
+    Agrega as linhas por status.
+    
+    Linhas cujo status não está em wanted_statuses são descartadas antes da conversão das
+    colunas numéricas (a API não filtra por valor de célula).
+    
+    Returns:
+        (nomes dos status encontrados, matriz status x ano (int64), último TOTAL válido e
+        último Percentual válido por status (NaN se nenhum))
+    """
+    # O DataFrame completa as linhas curtas com None (linhas que não chegam à coluna de
+    # status ficam sem código de status e são descartadas)
+    frame = pd.DataFrame(rows, dtype=object)
+    if status_col_idx < frame.shape[1]:
+        raw_codes, raw_statuses = pd.factorize(frame[status_col_idx])
+    else:
+        raw_codes, raw_statuses = np.full(len(frame), -1), []
+    
+    # Status normalizado (trim) calculado só sobre os valores distintos
+    statuses = [v.strip() if isinstance(v, str) else str(v) for v in raw_statuses]
+    status_codes, status_names = pd.factorize(np.asarray(statuses, dtype=object))
+    # Pular status fora da configuração e valores em branco se não incluídos
+    valid_status = np.asarray(
+        [v in wanted_statuses and (include_blank or bool(v)) for v in statuses] + [False],
+        dtype=bool
+    )
+    keep = valid_status[raw_codes]  # código -1 (linha curta) cai na última posição (False)
+    row_status = status_codes[raw_codes[keep]]
+    
+    # Célula vazia ou inválida vira NaN (ignorada na soma por ano e no último TOTAL/Percentual
+    # válido do status)
+    def convert(col_idx, func, numeric_func):
+        if col_idx is None or col_idx >= frame.shape[1]:
+            return np.nan
+        return _convert_cells(frame[col_idx][keep], func, numeric_func)
+    
+    # Agregados em arrays indexados pelo código do status (matriz status x ano, TOTAL e Percentual)
+    n_statuses = len(status_names)
+    year_counts = np.zeros((n_statuses, len(year_keys)), dtype=np.int64)
+    for year_pos, year in enumerate(year_keys):
+        col_idx = year_columns.get(year)
+        if col_idx is None:
+            continue
+        year_values = np.nan_to_num(convert(col_idx, _cell_int, np.trunc), nan=0.0)
+        year_sums = np.bincount(row_status, weights=np.broadcast_to(year_values, row_status.shape), minlength=n_statuses)
+        # Ano repetido na lista é somado uma vez por ocorrência, como no laço original
+        year_counts[:, year_pos] = year_sums * years.count(year)
+    totals = _last_valid(row_status, convert(total_col_idx, _cell_int, np.trunc), n_statuses)
+    percentages = _last_valid(
+        row_status, convert(percentage_col_idx, _cell_percentage, lambda fractions: fractions * 100), n_statuses
+    )
+    
+    # Somente status com ao menos uma linha contabilizada
+    found = np.zeros(len(status_names), dtype=bool)
+    found[row_status] = True
+    return (
+        np.asarray(status_names, dtype=object)[found].tolist(),
+        year_counts[found],
+        totals[found],
+        percentages[found]
+    )
+
+
 def parse_status_data(
     data: Dict[str, Any],
     status_column: str,
@@ -172,10 +640,14 @@ def parse_status_data(
             'other_statuses': []
         }
     
+    # Índice nome -> posição montado uma vez (primeira ocorrência, como headers.index)
+    header_idx = {}
+    for col_idx, header in enumerate(headers):
+        header_idx.setdefault(header, col_idx)
+    
     # Encontrar índices das colunas
-    try:
-        status_col_idx = headers.index(status_column)
-    except ValueError:
+    status_col_idx = header_idx.get(status_column)
+    if status_col_idx is None:
         logger.error(f"Coluna '{status_column}' não encontrada. Colunas disponíveis: {headers}")
         raise ValueError(f"Coluna '{status_column}' não encontrada")
     
@@ -184,127 +656,60 @@ def parse_status_data(
     year_col_indices = {}
     for year in years:
         year_col_name = f"{year_prefix} {year}"
-        try:
-            year_col_indices[year] = headers.index(year_col_name)
-        except ValueError:
+        year_col_indices[year] = header_idx.get(year_col_name)
+        if year_col_indices[year] is None:
             logger.warning(f"Coluna '{year_col_name}' não encontrada para ano {year}")
-            year_col_indices[year] = None
     
     # Encontrar índices de TOTAL e Percentual
     total_col_name = status_config.get('columns', {}).get('total_column', 'TOTAL')
+    # Percentual chega sem formatação (UNFORMATTED_VALUE): a coluna deve ter formato % na
+    # planilha, cujo valor numérico é a fração (0.25 -> 25); texto como "25%" vale como está
     percentage_col_name = status_config.get('columns', {}).get('percentage_column', 'Percentual')
     
-    try:
-        total_col_idx = headers.index(total_col_name)
-    except ValueError:
-        total_col_idx = None
+    total_col_idx = header_idx.get(total_col_name)
+    if total_col_idx is None:
         logger.warning(f"Coluna '{total_col_name}' não encontrada")
     
-    try:
-        percentage_col_idx = headers.index(percentage_col_name)
-    except ValueError:
-        percentage_col_idx = None
+    percentage_col_idx = header_idx.get(percentage_col_name)
+    if percentage_col_idx is None:
         logger.warning(f"Coluna '{percentage_col_name}' não encontrada")
     
     # Processar linhas
-    status_counts = {}
     include_blank = status_config.get('include_blank', False)
+    year_columns = {year: col_idx for year, col_idx in year_col_indices.items() if col_idx is not None}
+    year_keys = list(dict.fromkeys(years))
+    main_config = status_config.get('main_statuses', [])
+    other_config = status_config.get('other_statuses', [])
+    # Só status configurados aparecem no resultado; os demais são filtrados antes de agregar
+    wanted_statuses = frozenset(s['sheet_value'] for s in chain(main_config, other_config))
+    status_names, status_years, totals, percentages = _aggregate_rows(
+        rows, status_col_idx, year_columns, year_keys, years,
+        total_col_idx, percentage_col_idx, include_blank, wanted_statuses
+    )
+    merged = {
+        status_value: (year_counts, total, percentage)
+        for status_value, year_counts, total, percentage
+        in zip(status_names, status_years, totals, percentages)
+    }
     
-    for row in rows:
-        if len(row) <= status_col_idx:
-            continue
-        
-        status_value = row[status_col_idx].strip() if status_col_idx < len(row) else ""
-        
-        # Pular valores em branco se não incluídos
-        if not status_value and not include_blank:
-            continue
-        
-        if status_value not in status_counts:
-            status_counts[status_value] = {
-                'years': {year: 0 for year in years},
-                'total': 0,
-                'percentage': 0.0
-            }
-        
-        # Processar valores por ano
-        for year in years:
-            if year_col_indices.get(year) is not None:
-                col_idx = year_col_indices[year]
-                if col_idx < len(row) and row[col_idx]:
-                    try:
-                        value = int(row[col_idx])
-                        status_counts[status_value]['years'][year] += value
-                    except (ValueError, TypeError):
-                        pass
-        
-        # Processar TOTAL
-        if total_col_idx is not None and total_col_idx < len(row) and row[total_col_idx]:
-            try:
-                status_counts[status_value]['total'] = int(row[total_col_idx])
-            except (ValueError, TypeError):
-                pass
-        
-        # Processar Percentual
-        if percentage_col_idx is not None and percentage_col_idx < len(row) and row[percentage_col_idx]:
-            try:
-                # Remover % se presente
-                pct_str = row[percentage_col_idx].replace('%', '').replace(',', '.').strip()
-                status_counts[status_value]['percentage'] = float(pct_str)
-            except (ValueError, TypeError):
-                pass
-    
-    # Separar status principais e outros
-    main_statuses = []
-    other_statuses = []
-    
-    main_status_values = {s['sheet_value'] for s in status_config.get('main_statuses', [])}
-    other_status_values = {s['sheet_value'] for s in status_config.get('other_statuses', [])}
-    
-    for status_value, counts in status_counts.items():
-        if status_value in main_status_values:
-            # Encontrar display_name correspondente
-            main_status_config = next(
-                (s for s in status_config.get('main_statuses', []) if s['sheet_value'] == status_value),
-                None
-            )
-            display_name = main_status_config['display_name'] if main_status_config else status_value
-            
-            main_statuses.append({
-                'name': display_name,
-                'sheet_value': status_value,
-                'years': counts['years'],
-                'total': counts['total'],
-                'percentage': counts['percentage']
-            })
-        elif status_value in other_status_values:
-            # Encontrar display_name correspondente
-            other_status_config = next(
-                (s for s in status_config.get('other_statuses', []) if s['sheet_value'] == status_value),
-                None
-            )
-            display_name = other_status_config['display_name'] if other_status_config else status_value
-            
-            other_statuses.append({
-                'name': display_name,
-                'sheet_value': status_value,
-                'years': counts['years'],
-                'total': counts['total'],
-                'percentage': counts['percentage']
-            })
-    
-    # Ordenar conforme ordem na configuração
-    main_statuses_ordered = []
-    for config_status in status_config.get('main_statuses', []):
-        found = next((s for s in main_statuses if s['sheet_value'] == config_status['sheet_value']), None)
-        if found:
-            main_statuses_ordered.append(found)
-    
-    other_statuses_ordered = []
-    for config_status in status_config.get('other_statuses', []):
-        found = next((s for s in other_statuses if s['sheet_value'] == config_status['sheet_value']), None)
-        if found:
-            other_statuses_ordered.append(found)
+    def status_counts(status_value):
+        entry = merged.get(status_value)
+        if entry is None:
+            return None
+        status_years, total, percentage = entry
+        return {
+            'years': dict(zip(year_keys, status_years.tolist())),
+            'total': 0 if np.isnan(total) else int(total),
+            'percentage': 0.0 if np.isnan(percentage) else float(percentage)
+        }
+    
+    # Separar status principais e outros, na ordem da configuração (um status presente nas
+    # duas listas fica só nos principais)
+    main_statuses_ordered = _ordered_statuses(main_config, status_counts)
+    other_statuses_ordered = _ordered_statuses(
+        other_config, status_counts,
+        exclude={s['sheet_value'] for s in main_config}
+    )
     
     return {
         'main_statuses': main_statuses_ordered,
@@ -1,52 +1,457 @@
-from flask import Blueprint, jsonify, render_template, Response, request, current_app
+from flask import Blueprint, jsonify, Response, request, current_app
 from .auth import login_required
 from . import config
 import os
 import json
 import re
+import hashlib
+import time
+import socket
+import tempfile
+import threading
+import traceback
+import urllib.error
+import urllib.request
 import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from datetime import datetime
+from types import SimpleNamespace
+from werkzeug.wsgi import wrap_file
+from datetime import date, datetime
 try:
-    from weasyprint import HTML
+    from weasyprint import CSS, HTML, default_url_fetcher
     from weasyprint.text.fonts import FontConfiguration
     WEASYPRINT_AVAILABLE = True
 except ImportError:
     WEASYPRINT_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Remover sys.path.insert - usar imports normais
 from data import reports_db
-from data.database import get_db_connection
+from data.database import get_pool
 import plotly.graph_objs as go
+import plotly.utils
 from .config import ROOT_DIR, IMAGES_DIR
-from .spreadsheet_files import read_spreadsheet_file
+from .spreadsheet_files import read_spreadsheet_file_stream
+from .enel_spreadsheets import (
+    _safe_id, _database_version, _lookup_spreadsheet,
+    _get_enel_spreadsheet_data_impl, _get_enel_spreadsheet_data_internal,
+    _get_enel_spreadsheet_data_by_natureza_internal
+)
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/api', template_folder='templates')
 logger = logging.getLogger(__name__)
 
+# orjson (opcional) decodifica os parâmetros JSON do PDF (status_names, comments) mais rápido.
+# orjson.JSONDecodeError é subclasse de json.JSONDecodeError.
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# Logger NDJSON de diagnóstico (.cursor/debug.log), configurado na primeira escrita
+_agent_logger = logging.getLogger(f'{__name__}.agent')
+_agent_logger.propagate = False
+_agent_logger_lock = threading.Lock()
+
+
+def _agent_log(hypothesis_id: str, location: str, message: str, data: dict):
+    """Registra uma linha NDJSON em .cursor/debug.log; chamar só com config.DEBUG_AGENT_LOG ativo."""
+    try:
+        with _agent_logger_lock:
+            if not _agent_logger.handlers:
+                Path('.cursor').mkdir(exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    '.cursor/debug.log', maxBytes=10 * 1024 * 1024, backupCount=1, encoding='utf-8'
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                _agent_logger.addHandler(handler)
+                _agent_logger.setLevel(logging.DEBUG)
+        _agent_logger.debug(json.dumps({
+            'sessionId': 'debug-session',
+            'runId': 'run1',
+            'hypothesisId': hypothesis_id,
+            'location': location,
+            'message': message,
+            'data': data,
+            'timestamp': int(datetime.now().timestamp() * 1000)
+        }))
+    except Exception:
+        pass
+
+# Imagens do PDF vão para o WeasyPrint como bytes crus via url_fetcher, sem o desvio por
+# data URI base64 (codificar aqui e decodificar lá). O src no HTML é "pdf-image:<hash do
+# conteúdo>", então a URL muda junto com o arquivo e o cache de imagens compartilhado
+# (_pdf_image_cache, chaveado por URL) nunca mistura logos de clientes diferentes.
+PDF_IMAGE_SCHEME = 'pdf-image'
+
+def _pdf_image(img_data: bytes, mime_type: str) -> tuple:
+    """(URL pdf-image, mime_type, bytes) da imagem"""
+    digest = hashlib.blake2b(img_data, digest_size=16).hexdigest()
+    return f"{PDF_IMAGE_SCHEME}:{digest}", mime_type, img_data
+
+@lru_cache(maxsize=64)
+def _image_cached(image_path: str, mtime_ns: int) -> tuple:
+    """Imagem lida do disco por (caminho, mtime_ns); arquivo alterado gera nova entrada."""
+    with open(image_path, 'rb') as img_file:
+        img_data = img_file.read()
+    img_ext = os.path.splitext(image_path)[1].lower()
+    mime_type = 'image/png' if img_ext == '.png' else 'image/jpeg'
+    logger.info(f"Imagem carregada: {image_path} -> {len(img_data)} bytes")
+    return _pdf_image(img_data, mime_type)
+
+def _get_image(image_path):
+    """Imagem para o PDF (reaproveitada entre PDFs enquanto o arquivo não mudar); None se falhar"""
+    try:
+        return _image_cached(image_path, os.stat(image_path).st_mtime_ns)
+    except FileNotFoundError:
+        logger.warning(f"Arquivo de imagem não encontrado: {image_path}")
+        return None
+    except Exception as e:
+        logger.error(f"Erro ao carregar imagem {image_path}: {e}")
+        return None
+
+def _pdf_url_fetcher(images: dict, url: str, *args, **kwargs) -> dict:
+    """url_fetcher do WeasyPrint: serve as imagens registradas na requisição direto da memória"""
+    image = images.get(url)
+    if image is not None:
+        mime_type, img_data = image
+        return {'string': img_data, 'mime_type': mime_type, 'redirected_url': url}
+    return default_url_fetcher(url, *args, **kwargs)
+
+# Falhas recentes do download do logo ENEL (host -> instante a partir do qual tentar de novo):
+# o frontend pode ainda não estar no ar logo após o start do backend, então a falha não é
+# guardada para sempre, só evita repetir os GETs com timeout a cada PDF nesse intervalo
+_ENEL_LOGO_RETRY_SECONDS = 60
+_ENEL_LOGO_FAILURES_MAXSIZE = 32
+_enel_logo_failures: dict = {}
+_enel_logo_failures_lock = threading.Lock()
+
+def _download_enel_logo(request_host: str):
+    """
+    Logo ENEL baixado via HTTP do container frontend (nginx), ou None se indisponível.
+    
+    Download bem-sucedido fica em cache por host da requisição; falha é lembrada por
+    _ENEL_LOGO_RETRY_SECONDS e depois uma nova rodada de tentativas é feita.
+    """
+    now = time.monotonic()
+    with _enel_logo_failures_lock:
+        retry_at = _enel_logo_failures.get(request_host)
+        if retry_at is not None:
+            if retry_at > now:
+                return None
+            del _enel_logo_failures[request_host]
+    try:
+        return _download_enel_logo_cached(request_host)
+    except LookupError:
+        with _enel_logo_failures_lock:
+            if len(_enel_logo_failures) >= _ENEL_LOGO_FAILURES_MAXSIZE:
+                # Ordem de inserção: a falha mais antiga sai primeiro
+                del _enel_logo_failures[next(iter(_enel_logo_failures))]
+            _enel_logo_failures[request_host] = time.monotonic() + _ENEL_LOGO_RETRY_SECONDS
+        return None
+
+@lru_cache(maxsize=8)
+def _download_enel_logo_cached(request_host: str):
+    """
+    Baixa o logo ENEL e devolve a imagem para o PDF. Só o sucesso fica no lru_cache: a falha
+    sai como LookupError, que o lru_cache não guarda.
+    """
+    # Tentar diferentes URLs possíveis para o logo
+    # No Docker, o frontend está acessível pelo nome do serviço 'frontend' na mesma rede
+    possible_urls = []
+    
+    # 1. Via nome do serviço Docker (mais provável em produção)
+    possible_urls.append('http://frontend/images/enel-logo.png')
+    
+    # 2. Via variável de ambiente se configurada
+    frontend_url = os.environ.get('FRONTEND_URL', '')
+    if frontend_url:
+        possible_urls.insert(0, f'{frontend_url.rstrip("/")}/images/enel-logo.png')
+    
+    # 3. Via host da requisição atual (se frontend e backend estão no mesmo domínio)
+    if request_host:
+        possible_urls.append(f'http://{request_host}/images/enel-logo.png')
+    
+    # 4. Tentativas locais para desenvolvimento
+    possible_urls.extend([
+        'http://localhost/images/enel-logo.png',
+        'http://127.0.0.1/images/enel-logo.png',
+    ])
+    
+    for url in possible_urls:
+        try:
+            req = urllib.request.Request(url)
+            req.add_header('User-Agent', 'Mozilla/5.0')
+            with urllib.request.urlopen(req, timeout=3) as response:
+                if response.status == 200:
+                    img_data = response.read()
+                    logger.info(f"Logo ENEL baixado via HTTP: {url}")
+                    return _pdf_image(img_data, 'image/png')
+        except urllib.error.HTTPError as e:
+            logger.debug(f"HTTP {e.code} ao baixar logo de {url}")
+            continue
+        except (urllib.error.URLError, socket.timeout, socket.gaierror) as e:
+            logger.debug(f"Erro de conexão ao baixar logo de {url}: {e}")
+            continue
+        except Exception as e:
+            logger.debug(f"Erro ao baixar logo de {url}: {e}")
+            continue
+    raise LookupError(f"Logo ENEL indisponível via HTTP (host: {request_host or '-'})")
+
+# CSS do relatório (estático) analisado uma vez por processo e reaproveitado em todos os PDFs;
+# o template HTML não traz mais <style> embutido
+REPORT_CSS_PATH = config.TEMPLATES_DIR / 'report_pdf.css'
+
+# Cache de imagens do WeasyPrint compartilhado entre PDFs (chave = URL; os logos se repetem a
+# cada relatório e são decodificados só na primeira renderização)
+_pdf_image_cache: dict = {}
+
+@lru_cache(maxsize=1)
+def _report_pdf_assets() -> tuple:
+    """(FontConfiguration, [CSS do relatório]) compartilhados entre as renderizações"""
+    font_config = FontConfiguration()
+    return font_config, [CSS(filename=str(REPORT_CSS_PATH), font_config=font_config)]
+
+@lru_cache(maxsize=1)
+def _report_pdf_template():
+    """Template report_pdf.html compilado, resolvido uma vez por processo"""
+    return current_app.jinja_env.get_template('report_pdf.html')
+
+def _get_report_pdf_template():
+    """
+    Template do PDF: o objeto em cache, ou nova busca no loader quando TEMPLATES_AUTO_RELOAD
+    está ativo (desenvolvimento), para que edições no HTML apareçam sem reiniciar.
+    """
+    if current_app.jinja_env.auto_reload:
+        return current_app.jinja_env.get_template('report_pdf.html')
+    return _report_pdf_template()
+
+# Leituras de planilhas do PDF (arquivo/Google Sheets, I/O) disparadas juntas no início do
+# relatório em vez de uma após a outra; as threads só nascem no primeiro submit (pós-fork)
+_pdf_fetch_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='pdf-fetch')
+
+# PDFs gerados recentemente (chave -> (expira_em, bytes do PDF, nome do arquivo))
+_pdf_cache: dict = {}
+_pdf_cache_lock = threading.Lock()
+_PDF_CACHE_MAXSIZE = 16
+
+def _pdf_cache_key(client_id: str, args) -> str:
+    """
+    Chave do PDF: cliente, parâmetros da requisição (exceto preview), data de hoje (data de
+    corte e mês/ano padrão) e versões do banco e do diretório de planilhas (upload invalida).
+    """
+    try:
+        spreadsheets_version = os.stat(config.SPREADSHEETS_DIR).st_mtime_ns
+    except FileNotFoundError:
+        spreadsheets_version = 0
+    params = sorted((key, value) for key, value in args.items(multi=True) if key != 'preview')
+    raw = repr((client_id, params, date.today().isoformat(), _database_version(), spreadsheets_version))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+def _cached_pdf(key: str):
+    """(bytes do PDF, nome do arquivo) em cache e ainda válido, ou None"""
+    with _pdf_cache_lock:
+        entry = _pdf_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _pdf_cache[key]
+            return None
+        return entry[1], entry[2]
+
+def _store_pdf(key: str, pdf_bytes: bytes, filename: str, ttl: int):
+    with _pdf_cache_lock:
+        now = time.monotonic()
+        if len(_pdf_cache) >= _PDF_CACHE_MAXSIZE:
+            # Remove expirados; se ainda cheio, descarta o mais antigo inserido
+            for expired_key in [k for k, entry in _pdf_cache.items() if entry[0] <= now]:
+                del _pdf_cache[expired_key]
+            if len(_pdf_cache) >= _PDF_CACHE_MAXSIZE:
+                del _pdf_cache[next(iter(_pdf_cache))]
+        _pdf_cache[key] = (now + ttl, pdf_bytes, filename)
+
+def _pdf_response(pdf_bytes: bytes, filename: str, pdf_file=None, pdf_size: int = None) -> Response:
+    """
+    Resposta com o PDF: 'inline' para preview (abre no navegador), 'attachment' para download.
+    
+    Com pdf_file (arquivo temporário já no início), o corpo é lido em blocos do arquivo, que é
+    fechado pelo servidor WSGI ao final do envio; pdf_bytes é ignorado.
+    """
+    # Verificar se é preview ou download (via query param)
+    is_preview = request.args.get('preview', 'false').lower() == 'true'
+    disposition = 'inline' if is_preview else 'attachment'
+    headers = {
+        'Content-Disposition': f'{disposition}; filename="{filename}"',
+        'Content-Type': 'application/pdf'
+    }
+    if pdf_file is not None:
+        headers['Content-Length'] = str(pdf_size)
+        return Response(
+            wrap_file(request.environ, pdf_file),
+            mimetype='application/pdf',
+            headers=headers,
+            direct_passthrough=True
+        )
+    return Response(pdf_bytes, mimetype='application/pdf', headers=headers)
+
+# Página do comentário -> variável do template com os comentários daquela página
+_COMMENT_PAGE_VARS = {
+    'Visão Geral - Alvarás de Funcionamento': 'alvaras_comments',
+    'Licença Sanitária - Renovação': 'licenca_comments',
+    'Anuência Ambiental': 'anuencia_comments',
+    'Certificado de aprovação Bombeiro': 'certificado_bombeiro_comments',
+    'Alvarás de Funcionamento - Renovação (SP)': 'legalizacao_sp_comments',
+    'Serviços Diversos (SP)': 'servicos_diversos_sp_comments',
+    'Visão Geral - Alvarás de Funcionamento (RJ)': 'legalizacao_rj_comments',
+    'Certificado de Aprovação dos Bombeiros (RJ)': 'legalizacao_rj_bombeiro_comments',
+    'Regularização - SP': 'regularizacao_sp_comments',
+    'Regularização - RJ': 'regularizacao_rj_comments',
+    'Regularização - CTEEP': 'regularizacao_cteep_comments',
+}
+
+# Estados com página de legalização no relatório
+_VALID_ESTADOS = frozenset(('CE', 'SP', 'RJ'))
+
+def _parse_list_param(param: str, default: list, sep: str = ',') -> list:
+    """Lista de códigos em maiúsculas de um parâmetro separado por sep; 'NONE' = [], vazio = default"""
+    parts = [e.strip().upper() for e in param.split(sep) if e.strip()]
+    if parts == ['NONE']:
+        return []
+    return parts or list(default)
+
+# Tentar múltiplos caminhos possíveis para o frontend
+_POSSIBLE_FRONTEND_DIRS = (
+    ROOT_DIR / 'portal-frontend' / 'images',  # Primeira opção: mesmo nível que portal-backend
+    ROOT_DIR.parent / 'portal-frontend' / 'images',  # Segunda opção: nível acima
+    Path('/app') / 'portal-frontend' / 'images',  # Caminho absoluto no container
+    Path('/app/portal-frontend/images'),  # Caminho absoluto direto
+)
+
+@lru_cache(maxsize=1)
+def _find_frontend_enel_logo() -> tuple:
+    """
+    (caminho do enel-logo.png, diretório de imagens do frontend) ou (None, None).
+    Os caminhos são fixos no build, então a busca roda uma vez por processo.
+    """
+    for frontend_dir in _POSSIBLE_FRONTEND_DIRS:
+        enel_path_str = str(frontend_dir / 'enel-logo.png')
+        if os.path.exists(enel_path_str):
+            logger.info(f"Diretório frontend encontrado: {frontend_dir}, Logo ENEL: {enel_path_str}")
+            return enel_path_str, frontend_dir
+        logger.debug(f"Logo ENEL não encontrado em: {enel_path_str}")
+    return None, None
+
+@lru_cache(maxsize=1)
+def _find_fluxograma_cteep() -> str:
+    """Caminho do fluxograma CTEEP (frontend ou backend) ou '' se não existir; resolvido uma vez"""
+    possible_fluxograma_paths = [
+        str(ROOT_DIR / 'portal-frontend' / 'images' / 'fluxograma_cteep.png'),
+        str(ROOT_DIR.parent / 'portal-frontend' / 'images' / 'fluxograma_cteep.png'),
+        str(IMAGES_DIR / 'fluxograma_cteep.png'),
+    ]
+    for flux_path in possible_fluxograma_paths:
+        if os.path.exists(flux_path):
+            return flux_path
+    return ''
+
+# Caminhos fixos dos logos no backend
+MR_LOGO_PATH = str(IMAGES_DIR / 'mr-consultoria-logo.png')
+ENEL_ALT_PATHS = tuple(
+    str(IMAGES_DIR / name) for name in ('enel-logo.png', 'ENEL-logo.png', 'enel_logo.png', 'ENEL_logo.png')
+)
+
+@lru_cache(maxsize=32)
+def _resolve_client_logo_path(is_enel: bool, client_logo_filename: str) -> str:
+    """
+    Caminho do logo do cliente (frontend/backend/variações para ENEL). Os logos são fixos no
+    build, então a cascata de verificações roda uma vez por (ENEL ou não, arquivo do logo).
+    """
+    frontend_enel_path, frontend_images_dir = _find_frontend_enel_logo()
+    
+    client_logo_path = None  # Inicializar variável
+    
+    if is_enel:
+        # Sempre usar logo do frontend para ENEL se encontrado
+        if frontend_enel_path and os.path.exists(frontend_enel_path):
+            client_logo_path = frontend_enel_path
+            logger.info(f"Logo ENEL encontrado no frontend: {frontend_enel_path}")
+        else:
+            # Tentar backend como fallback
+            backend_path = str(IMAGES_DIR / client_logo_filename)
+            if os.path.exists(backend_path):
+                client_logo_path = backend_path
+                logger.warning(f"Logo ENEL não encontrado no frontend, usando backend: {backend_path}")
+            else:
+                # Último recurso: tentar variações no backend
+                for alt_path in ENEL_ALT_PATHS:
+                    if os.path.exists(alt_path):
+                        client_logo_path = alt_path
+                        logger.info(f"Logo ENEL encontrado em caminho alternativo: {client_logo_path}")
+                        break
+                else:
+                    # Se não encontrou nada, usar o caminho do frontend mesmo que não exista (para debug)
+                    client_logo_path = frontend_enel_path if frontend_enel_path else str(IMAGES_DIR / client_logo_filename)
+                    logger.error(f"Logo ENEL não encontrado em nenhum lugar! Tentando: {client_logo_path}")
+    else:
+        # Para outros clientes, tentar backend primeiro
+        client_logo_path = str(IMAGES_DIR / client_logo_filename)
+        if not os.path.exists(client_logo_path) and frontend_images_dir:
+            # Se não encontrou no backend, tentar no frontend
+            frontend_client_logo_path = str(frontend_images_dir / client_logo_filename)
+            if os.path.exists(frontend_client_logo_path):
+                client_logo_path = frontend_client_logo_path
+                logger.info(f"Logo encontrado no frontend: {frontend_client_logo_path}")
+    
+    # Garantir que client_logo_path está definido
+    if not client_logo_path:
+        client_logo_path = str(IMAGES_DIR / client_logo_filename)
+        logger.warning(f"client_logo_path não definido, usando padrão: {client_logo_path}")
+    return client_logo_path
+
+@reports_bp.record_once
+def _warm_image_cache(state):
+    """
+    Resolve os caminhos fixos de imagens (logo ENEL do frontend, fluxograma CTEEP) e
+    pré-carrega o logo da MR ao registrar o blueprint
+    """
+    if os.path.exists(MR_LOGO_PATH):
+        _get_image(MR_LOGO_PATH)
+    _find_frontend_enel_logo()
+    _find_fluxograma_cteep()
+
+@lru_cache(maxsize=4)
+def _clients_cached(db_version: tuple) -> tuple:
+    """Tabela clients inteira por versão do banco (db_version faz parte da chave)."""
+    with get_pool().reader() as conn:
+        return tuple(tuple(row) for row in conn.execute('SELECT id, nome, logo_path FROM clients'))
+
+
+def _get_clients() -> list:
+    """Clientes como dicts novos (id, nome, logo_path); lidos do banco só quando ele muda."""
+    return [
+        {'id': client_id, 'nome': nome, 'logo_path': logo_path}
+        for client_id, nome, logo_path in _clients_cached(_database_version())
+    ]
+
+
 def _find_enel_spreadsheet_file(spreadsheet_name: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT file_path, file_name
-        FROM enel_spreadsheets
-        WHERE spreadsheet_name = ?
-    ''', (spreadsheet_name,))
-    result = cursor.fetchone()
-    conn.close()
+    # Registro em cache por versão do banco (mesma consulta do módulo enel_spreadsheets)
+    result = _lookup_spreadsheet(spreadsheet_name)
     if not result:
         return None
 
-    file_path = result['file_path']
-    file_name = result['file_name']
+    file_path, file_name, _, _ = result
     file_path_obj = Path(file_path) if isinstance(file_path, str) else file_path
 
     if file_path_obj.exists():
         return file_path_obj
 
     if config.SPREADSHEETS_DIR.exists():
-        safe_spreadsheet_id = spreadsheet_name.replace(' ', '_').replace('/', '_').replace('\\', '_') \
-            .replace('á', 'a').replace('Á', 'A').replace('ã', 'a').replace('Ã', 'A')
+        safe_spreadsheet_id = _safe_id(spreadsheet_name)
         for ext in ['.xlsx', '.xls']:
             expected_path = config.SPREADSHEETS_DIR / f"ENEL_{safe_spreadsheet_id}{ext}"
             if expected_path.exists():
@@ -325,7 +730,7 @@ def get_regularizacao_sp():
     if not file_path_obj:
         return jsonify({'error': f'Planilha não encontrada: {spreadsheet_name}'}), 404
 
-    sheet_data = read_spreadsheet_file(
+    sheet_data = read_spreadsheet_file_stream(
         file_path=str(file_path_obj),
         sheet_name=sheet_name,
         header=None
@@ -344,7 +749,7 @@ def get_regularizacao_rj():
         return jsonify({'error': f'Planilha não encontrada: {spreadsheet_name}'}), 404
 
     # Ler planilha começando na linha 3 (header_row=2 pois é 0-indexed)
-    sheet_data = read_spreadsheet_file(
+    sheet_data = read_spreadsheet_file_stream(
         file_path=str(file_path_obj),
         sheet_name=sheet_name,
         header=2  # Linha 3 (0-indexed = 2)
@@ -362,7 +767,7 @@ def get_regularizacao_cteep():
     if not file_path_obj:
         return jsonify({'error': f'Planilha não encontrada: {spreadsheet_name}'}), 404
 
-    sheet_data = read_spreadsheet_file(
+    sheet_data = read_spreadsheet_file_stream(
         file_path=str(file_path_obj),
         sheet_name=sheet_name,
         header=0
@@ -374,24 +779,17 @@ def get_regularizacao_cteep():
 @login_required
 def get_clients():
     """Lista todos os clientes disponíveis"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, nome, logo_path FROM clients')
-    clients = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify({'clients': clients})
-
-@reports_bp.route('/reports/<client_id>', methods=['GET'])
-@login_required
-def get_report(client_id):
-    """Retorna os dados do relatório para um cliente (legado - mantido para compatibilidade)"""
-    data = reports_db.get_report_data(client_id)
-    if not data:
-        return jsonify({'error': 'Cliente não encontrado'}), 404
-    
-    # Criar gráfico de barras verticais
-    categorias = data['chart_data']['categories']
-    valores = data['chart_data']['values']
+    return jsonify({'clients': _get_clients()})
+
+@lru_cache(maxsize=32)
+def _report_graph_dict(categorias: tuple, valores: tuple) -> dict:
+    """
+    Gráfico de barras verticais do relatório legado já serializado para dict (Plotly).
+    Em cache pelos dados do gráfico: a figura e a codificação JSON rodam uma vez por conjunto
+    de dados, não a cada requisição. O dict retornado é compartilhado (somente leitura).
+    """
+    categorias = list(categorias)
+    valores = list(valores)
     
     fig = go.Figure(data=[
         go.Bar(
@@ -415,9 +813,21 @@ def get_report(client_id):
     )
     
     # Converter gráfico para dict
-    import plotly.utils
     graphJSON = plotly.utils.PlotlyJSONEncoder().encode(fig)
-    graph_dict = json.loads(graphJSON)
+    return json.loads(graphJSON)
+
+@reports_bp.route('/reports/<client_id>', methods=['GET'])
+@login_required
+def get_report(client_id):
+    """Retorna os dados do relatório para um cliente (legado - mantido para compatibilidade)"""
+    data = reports_db.get_report_data(client_id)
+    if not data:
+        return jsonify({'error': 'Cliente não encontrado'}), 404
+    
+    graph_dict = _report_graph_dict(
+        tuple(data['chart_data']['categories']),
+        tuple(data['chart_data']['values'])
+    )
     
     return jsonify({
         'table_data': data['table_data'],
@@ -436,6 +846,17 @@ def generate_pdf(client_id):
         logger.error("WeasyPrint não está disponível")
         return jsonify({'error': 'WeasyPrint não está instalado. Execute: pip install WeasyPrint>=66.0'}), 500
     
+    # PDF idêntico gerado há pouco (mesmos parâmetros, mesmo dia, dados inalterados)
+    pdf_cache_key = None
+    if config.PDF_CACHE_TTL > 0:
+        pdf_cache_key = _pdf_cache_key(client_id, request.args)
+        cached = _cached_pdf(pdf_cache_key)
+        if cached is not None:
+            logger.info(f"PDF servido do cache: client_id={client_id}")
+            return _pdf_response(*cached)
+    # Só vai para o cache o PDF completo: qualquer falha abaixo (planilha, logo) o torna parcial
+    complete = True
+    
     # Obter parâmetros de configuração do relatório
     # report_month e report_year são os valores de referência do relatório
     report_month = request.args.get('report_month', type=int)
@@ -453,7 +874,6 @@ def generate_pdf(client_id):
     if report_year_start is None:
         report_year_start = 2024  # Padrão
     if report_year_end is None:
-        from datetime import datetime
         report_year_end = datetime.now().year  # Padrão: ano atual
     
     # Gerar lista de anos
@@ -463,91 +883,40 @@ def generate_pdf(client_id):
     legalizacao_param = request.args.get('legalizacao', 'CE,SP,RJ')
     regularizacao_param = request.args.get('regularizacao', 'RJ,SP,CTEEP')
     
-    # Processar legalização (separado por vírgula)
-    legalizacao_lista = [e.strip().upper() for e in legalizacao_param.split(',') if e.strip()]
-    if legalizacao_lista == ['NONE']:
-        legalizacao_lista = []
-    elif not legalizacao_lista:
-        legalizacao_lista = ['CE', 'SP', 'RJ']  # Padrão
-    
-    # Processar regularização (separado por vírgula)
-    regularizacao_lista = [e.strip().upper() for e in regularizacao_param.split(',') if e.strip()]
-    if regularizacao_lista == ['NONE']:
-        regularizacao_lista = []
-    elif not regularizacao_lista:
-        regularizacao_lista = ['RJ', 'SP', 'CTEEP']  # Padrão
+    # Processar legalização e regularização (separados por vírgula; 'NONE' = nenhuma)
+    legalizacao_lista = _parse_list_param(legalizacao_param, ['CE', 'SP', 'RJ'])
+    regularizacao_lista = _parse_list_param(regularizacao_param, ['RJ', 'SP', 'CTEEP'])
     
-    # Obter estados selecionados (padrão: CE&SP&RJ) - mantido para compatibilidade
-    estados_param = request.args.get('estados', 'CE&SP&RJ')
-    # Validar e limpar estados
-    estados_validos = ['CE', 'SP', 'RJ']
-    estados_lista = [e.strip().upper() for e in estados_param.split('&') if e.strip().upper() in estados_validos]
-    if not estados_lista:
-        estados_lista = ['CE', 'SP', 'RJ']  # Fallback para padrão
-    # Sincronizar estados com seleção de legalização
-    if legalizacao_lista:
-        estados_lista = [e for e in legalizacao_lista if e in estados_validos]
-    else:
-        estados_lista = []
+    # Estados sincronizados com a seleção de legalização (o parâmetro 'estados', mantido por
+    # compatibilidade, é sempre sobrescrito por ela)
+    estados_lista = [e for e in legalizacao_lista if e in _VALID_ESTADOS]
     estados_str = '|'.join(estados_lista)  # Usar | para exibição no PDF
     
     # Obter nomes de status customizados (JSON)
     status_names_param = request.args.get('status_names', '{}')
     try:
-        status_names = json.loads(status_names_param) if status_names_param else {}
+        status_names = _json_loads(status_names_param) if status_names_param else {}
     except json.JSONDecodeError:
         status_names = {}
     
     # Obter comentários (JSON array)
     comments_param = request.args.get('comments', '[]')
     try:
-        comments = json.loads(comments_param) if comments_param else []
+        comments = _json_loads(comments_param) if comments_param else []
     except json.JSONDecodeError:
         comments = []
     
-    # Separar comentários por página
-    alvaras_comments = []
-    licenca_comments = []
-    anuencia_comments = []
-    certificado_bombeiro_comments = []
-    legalizacao_sp_comments = []
-    servicos_diversos_sp_comments = []
-    legalizacao_rj_comments = []
-    legalizacao_rj_bombeiro_comments = []
-    regularizacao_sp_comments = []
-    regularizacao_rj_comments = []
-    regularizacao_cteep_comments = []
+    # Separar comentários por página (nome da variável do template -> lista)
+    comments_by_page = {name: [] for name in _COMMENT_PAGE_VARS.values()}
     for comment in comments:
-        if isinstance(comment, dict):
-            page = comment.get('page', '')
-            if page == 'Licença Sanitária - Renovação':
-                licenca_comments.append(comment)
-            elif page == 'Anuência Ambiental':
-                anuencia_comments.append(comment)
-            elif page == 'Certificado de aprovação Bombeiro':
-                certificado_bombeiro_comments.append(comment)
-            elif page == 'Alvarás de Funcionamento - Renovação (SP)':
-                legalizacao_sp_comments.append(comment)
-            elif page == 'Serviços Diversos (SP)':
-                servicos_diversos_sp_comments.append(comment)
-            elif page == 'Visão Geral - Alvarás de Funcionamento (RJ)':
-                legalizacao_rj_comments.append(comment)
-            elif page == 'Certificado de Aprovação dos Bombeiros (RJ)':
-                legalizacao_rj_bombeiro_comments.append(comment)
-            elif page == 'Regularização - SP':
-                regularizacao_sp_comments.append(comment)
-            elif page == 'Regularização - RJ':
-                regularizacao_rj_comments.append(comment)
-            elif page == 'Regularização - CTEEP':
-                regularizacao_cteep_comments.append(comment)
-            elif not page or page == 'Visão Geral - Alvarás de Funcionamento':
-                alvaras_comments.append(comment)
-        else:
-            # Comentários antigos sem página definida vão para Alvarás
-            alvaras_comments.append(comment)
+        # Comentários antigos sem página definida vão para Alvarás
+        page = comment.get('page', '') if isinstance(comment, dict) else ''
+        if not page:
+            comments_by_page['alvaras_comments'].append(comment)
+        elif isinstance(page, str) and page in _COMMENT_PAGE_VARS:
+            comments_by_page[_COMMENT_PAGE_VARS[page]].append(comment)
     
     # Valores padrão se não fornecidos
-    from datetime import datetime
     if mes is None:
         mes = datetime.now().month - 1  # 0-11
     if ano is None:
@@ -565,256 +934,86 @@ def generate_pdf(client_id):
     month_name = meses[mes]
     
     # Buscar dados do cliente
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, nome, logo_path FROM clients WHERE id = ?', (client_id,))
-    client = cursor.fetchone()
-    conn.close()
-    
-    if not client:
+    client_dict = next((client for client in _get_clients() if client['id'] == client_id), None)
+    if not client_dict:
         return jsonify({'error': 'Cliente não encontrado'}), 404
     
-    client_dict = dict(client)
-    
-    # Import datetime para logs (antes de usar)
-    from datetime import datetime as dt
+    # Cliente ENEL: logo buscado no frontend primeiro, com fallback HTTP e nomes alternativos
+    is_enel = client_id.lower() == 'enel' or (client_dict.get('nome') or '').upper() == 'ENEL'
     
-    # Preparar paths das imagens e converter para base64 (WeasyPrint funciona melhor com base64)
+    # Preparar paths das imagens (entregues ao WeasyPrint como bytes pelo url_fetcher)
     images_dir = config.IMAGES_DIR
     
-    def get_image_base64(image_path):
-        """Converte imagem para base64"""
-        import base64
-        try:
-            if os.path.exists(image_path):
-                with open(image_path, 'rb') as img_file:
-                    img_data = img_file.read()
-                    img_ext = os.path.splitext(image_path)[1].lower()
-                    mime_type = 'image/png' if img_ext == '.png' else 'image/jpeg'
-                    base64_str = f"data:{mime_type};base64,{base64.b64encode(img_data).decode('utf-8')}"
-                    logger.info(f"Imagem convertida: {image_path} -> {len(base64_str)} chars")
-                    return base64_str
-            else:
-                logger.warning(f"Arquivo de imagem não encontrado: {image_path}")
-                return ""
-        except Exception as e:
-            logger.error(f"Erro ao converter imagem {image_path}: {e}")
-            return ""
-    
     # Construir caminhos corretos das imagens
-    mr_logo_path = str(images_dir / 'mr-consultoria-logo.png')
+    mr_logo_path = MR_LOGO_PATH
     # Remover 'images/' do logo_path se existir e construir caminho completo
     client_logo_filename = client_dict['logo_path'].replace('images/', '').replace('static/images/', '')
     
-    # Para ENEL, sempre buscar no frontend primeiro (caminho exato informado pelo usuário)
-    # Tentar múltiplos caminhos possíveis para o frontend
-    possible_frontend_dirs = [
-        ROOT_DIR / 'portal-frontend' / 'images',  # Primeira opção: mesmo nível que portal-backend
-        ROOT_DIR.parent / 'portal-frontend' / 'images',  # Segunda opção: nível acima
-        Path('/app') / 'portal-frontend' / 'images',  # Caminho absoluto no container
-        Path('/app/portal-frontend/images'),  # Caminho absoluto direto
-    ]
+    # Diretório de imagens do frontend (fallback dos logos mais abaixo)
+    _, frontend_images_dir = _find_frontend_enel_logo()
     
-    frontend_enel_path = None
-    frontend_images_dir = None
-    
-    # Listar conteúdo de /app para entender estrutura
-    app_dir_contents = []
-    if os.path.exists('/app'):
-        try:
-            app_dir_contents = [item.name for item in Path('/app').iterdir() if item.is_dir()]
-        except Exception as e:
-            app_dir_contents = [f"Erro ao listar: {str(e)}"]
-    
-    # Tentar encontrar o arquivo usando busca recursiva limitada
-    found_enel_logo_paths = []
-    search_paths = ['/app', '/app/portal-frontend', '/app/portal-frontend/images']
-    for search_path in search_paths:
-        if os.path.exists(search_path):
-            try:
-                for root, dirs, files in os.walk(search_path):
-                    if 'enel-logo.png' in files:
-                        found_enel_logo_paths.append(os.path.join(root, 'enel-logo.png'))
-                    # Limitar profundidade para não demorar muito
-                    if root.count(os.sep) - search_path.count(os.sep) > 2:
-                        dirs[:] = []
-            except Exception as e:
-                pass
-    # Se encontrou o arquivo na busca, usar o primeiro resultado
-    if found_enel_logo_paths:
-        frontend_enel_path = found_enel_logo_paths[0]
-        frontend_images_dir = Path(frontend_enel_path).parent
-        logger.info(f"Logo ENEL encontrado via busca recursiva: {frontend_enel_path}")
-    
-    for frontend_dir in possible_frontend_dirs:
-        enel_path = frontend_dir / 'enel-logo.png'
-        enel_path_str = str(enel_path)
-        if os.path.exists(enel_path_str):
-            frontend_enel_path = enel_path_str
-            frontend_images_dir = frontend_dir
-            logger.info(f"Diretório frontend encontrado: {frontend_dir}, Logo ENEL: {frontend_enel_path}")
-            break
-        else:
-            logger.debug(f"Logo ENEL não encontrado em: {enel_path_str}")
-    
-    # Determinar caminho do logo do cliente
-    client_logo_path = None  # Inicializar variável
-    
-    if client_id.lower() == 'enel' or client_dict.get('nome', '').upper() == 'ENEL':
-        # Sempre usar logo do frontend para ENEL se encontrado
-        if frontend_enel_path and os.path.exists(frontend_enel_path):
-            client_logo_path = frontend_enel_path
-            logger.info(f"Logo ENEL encontrado no frontend: {frontend_enel_path}")
-        else:
-            # Tentar backend como fallback
-            backend_path = str(images_dir / client_logo_filename)
-            if os.path.exists(backend_path):
-                client_logo_path = backend_path
-                logger.warning(f"Logo ENEL não encontrado no frontend, usando backend: {backend_path}")
-            else:
-                # Último recurso: tentar variações no backend
-                alt_paths = [
-                    str(images_dir / 'enel-logo.png'),
-                    str(images_dir / 'ENEL-logo.png'),
-                    str(images_dir / 'enel_logo.png'),
-                    str(images_dir / 'ENEL_logo.png'),
-                ]
-                for alt_path in alt_paths:
-                    if os.path.exists(alt_path):
-                        client_logo_path = alt_path
-                        logger.info(f"Logo ENEL encontrado em caminho alternativo: {client_logo_path}")
-                        break
-                else:
-                    # Se não encontrou nada, usar o caminho do frontend mesmo que não exista (para debug)
-                    client_logo_path = frontend_enel_path if frontend_enel_path else str(images_dir / client_logo_filename)
-                    logger.error(f"Logo ENEL não encontrado em nenhum lugar! Tentando: {client_logo_path}")
-    else:
-        # Para outros clientes, tentar backend primeiro
-        client_logo_path = str(images_dir / client_logo_filename)
-        if not os.path.exists(client_logo_path) and frontend_images_dir:
-            # Se não encontrou no backend, tentar no frontend
-            frontend_client_logo_path = str(frontend_images_dir / client_logo_filename)
-            if os.path.exists(frontend_client_logo_path):
-                client_logo_path = frontend_client_logo_path
-                logger.info(f"Logo encontrado no frontend: {frontend_client_logo_path}")
-    
-    # Garantir que client_logo_path está definido
-    if not client_logo_path:
-        client_logo_path = str(images_dir / client_logo_filename)
-        logger.warning(f"client_logo_path não definido, usando padrão: {client_logo_path}")
+    # Determinar caminho do logo do cliente (resolvido uma vez por cliente/logo; para ENEL,
+    # sempre busca no frontend primeiro)
+    client_logo_path = _resolve_client_logo_path(is_enel, client_logo_filename)
     
     # Log de caminhos para debug
     logger.info(f"Procurando imagens em: {images_dir}")
-    logger.info(f"Logo do cliente - Caminho: {client_logo_path}, Existe: {os.path.exists(client_logo_path)}")
+    logger.info(f"Logo do cliente - Caminho: {client_logo_path}")
     
-    # Converter para base64 (apenas logos, sem background)
-    mr_logo_base64 = get_image_base64(mr_logo_path)
-    client_logo_base64 = get_image_base64(client_logo_path)
+    # Carregar imagens (apenas logos, sem background)
+    mr_logo = _get_image(mr_logo_path)
+    client_logo = _get_image(client_logo_path)
     
     # Fluxograma CTEEP (para última página)
-    fluxograma_cteep_path = ''
-    fluxograma_cteep_base64 = ''
+    fluxograma_cteep = None
     try:
-        possible_fluxograma_paths = [
-            str(ROOT_DIR / 'portal-frontend' / 'images' / 'fluxograma_cteep.png'),
-            str(ROOT_DIR.parent / 'portal-frontend' / 'images' / 'fluxograma_cteep.png'),
-            str(IMAGES_DIR / 'fluxograma_cteep.png'),
-        ]
-        for flux_path in possible_fluxograma_paths:
-            if os.path.exists(flux_path):
-                fluxograma_cteep_path = flux_path
-                break
+        fluxograma_cteep_path = _find_fluxograma_cteep()
         if fluxograma_cteep_path:
-            fluxograma_cteep_base64 = get_image_base64(fluxograma_cteep_path)
+            fluxograma_cteep = _get_image(fluxograma_cteep_path)
     except Exception as e:
         logger.warning(f"Erro ao carregar fluxograma CTEEP: {e}")
+        complete = False
     
-    # Se ainda não encontrou o logo do cliente após converter, tentar buscar via HTTP do frontend
-    if not client_logo_base64:
+    # Se ainda não encontrou o logo do cliente após carregar, tentar buscar via HTTP do frontend
+    if not client_logo:
         # Para ENEL, tentar baixar via HTTP do container frontend (nginx)
-        if client_id.lower() == 'enel' or client_dict.get('nome', '').upper() == 'ENEL':
-            try:
-                import urllib.request
-                import socket
-                
-                # Tentar diferentes URLs possíveis para o logo
-                # No Docker, o frontend está acessível pelo nome do serviço 'frontend' na mesma rede
-                possible_urls = []
-                
-                # 1. Via nome do serviço Docker (mais provável em produção)
-                possible_urls.append('http://frontend/images/enel-logo.png')
-                
-                # 2. Via variável de ambiente se configurada
-                frontend_url = os.environ.get('FRONTEND_URL', '')
-                if frontend_url:
-                    possible_urls.insert(0, f'{frontend_url.rstrip("/")}/images/enel-logo.png')
-                
-                # 3. Via host da requisição atual (se frontend e backend estão no mesmo domínio)
-                if request.host:
-                    # Remover porta se houver
-                    host_without_port = request.host.split(':')[0]
-                    possible_urls.append(f'http://{host_without_port}/images/enel-logo.png')
-                
-                # 4. Tentativas locais para desenvolvimento
-                possible_urls.extend([
-                    'http://localhost/images/enel-logo.png',
-                    'http://127.0.0.1/images/enel-logo.png',
-                ])
-                
-                for url in possible_urls:
-                    try:
-                        req = urllib.request.Request(url)
-                        req.add_header('User-Agent', 'Mozilla/5.0')
-                        with urllib.request.urlopen(req, timeout=3) as response:
-                            if response.status == 200:
-                                img_data = response.read()
-                                import base64
-                                base64_str = f"data:image/png;base64,{base64.b64encode(img_data).decode('utf-8')}"
-                                client_logo_base64 = base64_str
-                                logger.info(f"Logo ENEL baixado via HTTP: {url}")
-                                break
-                    except urllib.error.HTTPError as e:
-                        logger.debug(f"HTTP {e.code} ao baixar logo de {url}")
-                        continue
-                    except (urllib.error.URLError, socket.timeout, socket.gaierror) as e:
-                        logger.debug(f"Erro de conexão ao baixar logo de {url}: {e}")
-                        continue
-                    except Exception as e:
-                        logger.debug(f"Erro ao baixar logo de {url}: {e}")
-                        continue
-            except Exception as e:
-                logger.warning(f"Erro ao tentar baixar logo via HTTP: {e}")
+        if is_enel:
+            client_logo = _download_enel_logo(request.host.split(':')[0] if request.host else '')
         
         # Se ainda não encontrou, tentar caminhos locais alternativos
-        if not client_logo_base64 and frontend_images_dir:
+        if not client_logo and frontend_images_dir:
             exact_enel_path = str(frontend_images_dir / 'enel-logo.png')
             if os.path.exists(exact_enel_path):
-                client_logo_base64 = get_image_base64(exact_enel_path)
+                client_logo = _get_image(exact_enel_path)
                 logger.info(f"Logo encontrado no frontend (caminho exato): {exact_enel_path}")
             else:
                 # Tentar também variações do nome no frontend
                 for alt_name in ['ENEL-logo.png', 'enel_logo.png', 'ENEL_logo.png', client_logo_filename]:
                     alt_frontend_path = str(frontend_images_dir / alt_name)
                     if os.path.exists(alt_frontend_path):
-                        client_logo_base64 = get_image_base64(alt_frontend_path)
+                        client_logo = _get_image(alt_frontend_path)
                         logger.info(f"Logo encontrado no frontend (alternativo): {alt_frontend_path}")
                         break
     
     # Log para debug
-    logger.info(f"Imagens carregadas - MR Logo: {len(mr_logo_base64) > 0}, Client Logo: {len(client_logo_base64) > 0}")
+    logger.info(f"Imagens carregadas - MR Logo: {mr_logo is not None}, Client Logo: {client_logo is not None}")
+    if not client_logo:
+        complete = False
+    # Imagens servidas pelo url_fetcher (URL pdf-image -> (mime_type, bytes))
+    pdf_images = {}
+    
+    def _image_src(image) -> str:
+        if image is None:
+            return ''
+        url, mime_type, img_data = image
+        pdf_images[url] = (mime_type, img_data)
+        return url
+    
+    mr_logo_src = _image_src(mr_logo)
+    client_logo_src = _image_src(client_logo)
+    fluxograma_cteep_src = _image_src(fluxograma_cteep)
     logger.info(f"Caminhos - MR: {mr_logo_path}, Client: {client_logo_path}")
-    logger.info(f"Arquivos existem - MR: {os.path.exists(mr_logo_path)}, Client: {os.path.exists(client_logo_path)}")
     
-    # Função auxiliar para converter chaves de anos
-    def convert_years_keys(years_dict):
-        """Converte chaves de string para int se necessário"""
-        if not years_dict:
-            return years_dict
-        keys_list = list(years_dict.keys())
-        if keys_list and isinstance(keys_list[0], str):
-            return {int(k): v for k, v in years_dict.items()}
-        return years_dict
-
     # Buscar dados de Legalização CE se CE estiver na lista
     legalizacao_ce_data = None
     licenca_sanitaria_data = None
@@ -826,256 +1025,139 @@ def generate_pdf(client_id):
     legalizacao_rj_bombeiro_data = None
     regularizacao_sp_data = None
     
+    # Disparar em paralelo todas as leituras de planilhas das UFs selecionadas; cada bloco
+    # abaixo só espera (.result()) pela sua. Exceções reaparecem no .result(), dentro do
+    # try/except do bloco, como antes.
+    filter_natureza_value = 'Renovação Licença Sanitária'
+    filter_natureza_anuencia = 'Anuência Ambiental'
+    filter_natureza_bombeiro = 'Certificado de aprovação Bombeiro'
+    fetches = {}
+    if 'CE' in legalizacao_lista:
+        # 1. Alvarás de Funcionamento da planilha 'Base Ceara Alvarás de funcionamento'
+        # (mesmo processamento do endpoint /data, chamado direto)
+        fetches['ce_alvaras'] = _pdf_fetch_executor.submit(
+            _get_enel_spreadsheet_data_impl,
+            'Base Ceara Alvarás de funcionamento',
+            years
+        )
+        # 2-4. Licença Sanitária, Anuência Ambiental e Certificado de aprovação Bombeiro da planilha
+        # 'ENEL - Legalização CE', filtrando por 'Relatório Natureza da Operação'.
+        # As três naturezas são processadas com uma única leitura e uma única passada pelas linhas.
+        fetches['ce_natureza'] = _pdf_fetch_executor.submit(
+            _get_enel_spreadsheet_data_by_natureza_internal,
+            spreadsheet_name='ENEL - Legalização CE',
+            natureza_values=[filter_natureza_value, filter_natureza_anuencia, filter_natureza_bombeiro],
+            years=years
+        )
+    if 'SP' in legalizacao_lista:
+        fetches['sp'] = _pdf_fetch_executor.submit(
+            _get_enel_spreadsheet_data_internal,
+            spreadsheet_name='Legalização SP',
+            years=years
+        )
+        # Serviços Diversos (SP) - aba "MR - Outros Serviços"
+        fetches['sp_servicos'] = _pdf_fetch_executor.submit(
+            _get_enel_spreadsheet_data_internal,
+            spreadsheet_name='Legalização SP',
+            years=years,
+            sheet_name='MR - Outros Serviços',
+            header_row=1,
+            item_column='Item',
+            item_not_equals='53',
+            year_column_name='ano Acionamento',
+            concluido_statuses=['Serviços diversos concluídos'],
+            status_column_override='Relatório Status detalhado'
+        )
+    if 'RJ' in legalizacao_lista:
+        fetches['rj'] = _pdf_fetch_executor.submit(
+            _get_enel_spreadsheet_data_internal,
+            spreadsheet_name='LEGALIZAÇÃO RJ_28-04',
+            years=years,
+            sheet_name='Base Alvarás',
+            status_column_override='Status detalhado Relatório',
+            year_column_name='ano Acionamento',
+            year_parse_mode='extract_year',
+            concluido_statuses=['Concluído'],
+            cancelado_statuses=['Cancelado']
+        )
+        # Certificado de Aprovação dos Bombeiros (RJ) - aba "Base Bombeiro"
+        fetches['rj_bombeiro'] = _pdf_fetch_executor.submit(
+            _get_enel_spreadsheet_data_internal,
+            spreadsheet_name='LEGALIZAÇÃO RJ_28-04',
+            years=years,
+            sheet_name='Base Bombeiro',
+            status_column_override='Status Geral do imóvel',
+            year_column_name='Ano Acionamento',
+            year_parse_mode='extract_year',
+            concluido_statuses=['CA emitido'],
+            status_exclude=['*']
+        )
+    
     if 'CE' in legalizacao_lista:
         try:
-            from .enel_spreadsheets import get_enel_spreadsheet_data
-            
-            # 1. Buscar dados de Alvarás de Funcionamento da planilha 'Base Ceara Alvarás de funcionamento'
-            spreadsheet_name_alvaras = 'Base Ceara Alvarás de funcionamento'
-            years_str = ','.join(map(str, years))
-            with current_app.test_request_context(
-                path=f'/api/enel-spreadsheets/{spreadsheet_name_alvaras}/data',
-                query_string=f'years={years_str}',
-                headers={'Authorization': request.headers.get('Authorization', '')}
-            ):
-                result = get_enel_spreadsheet_data(spreadsheet_name_alvaras)
-                if hasattr(result, 'get_json'):
-                    legalizacao_ce_data = result.get_json()
-                elif isinstance(result, tuple) and len(result) > 0:
-                    if result[1] == 200:
-                        legalizacao_ce_data = result[0].get_json() if hasattr(result[0], 'get_json') else None
-                    else:
-                        logger.warning(f"Erro ao buscar dados de Alvarás: status {result[1]}")
-            
-            # Converter anos nos dados de Alvarás
-            if legalizacao_ce_data:
-                if legalizacao_ce_data.get('total_demandado', {}).get('years'):
-                    legalizacao_ce_data['total_demandado']['years'] = convert_years_keys(legalizacao_ce_data['total_demandado']['years'])
-                if legalizacao_ce_data.get('concluidos', {}).get('years'):
-                    legalizacao_ce_data['concluidos']['years'] = convert_years_keys(legalizacao_ce_data['concluidos']['years'])
-                if legalizacao_ce_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    legalizacao_ce_data['em_andamento']['total']['years'] = convert_years_keys(legalizacao_ce_data['em_andamento']['total']['years'])
-                for subcat in legalizacao_ce_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
-            
-            # 2. Buscar dados de Licença Sanitária da planilha 'ENEL - Legalização CE'
-            # Filtrar apenas registros onde 'Relatório Natureza da Operação' = 'Renovação Licença Sanitária'
-            from .enel_spreadsheets import _get_enel_spreadsheet_data_internal
-            
-            spreadsheet_name_licenca = 'ENEL - Legalização CE'
-            filter_natureza_value = 'Renovação Licença Sanitária'
-            
-            result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name=spreadsheet_name_licenca,
-                years=years,
-                filter_natureza=filter_natureza_value
-            )
-            if isinstance(result, tuple) and len(result) > 0:
-                if result[1] == 200:
-                    licenca_sanitaria_data = result[0].get_json() if hasattr(result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Licença Sanitária: status {result[1]}")
-            elif hasattr(result, 'get_json'):
-                licenca_sanitaria_data = result.get_json()
-            
-            # Converter anos nos dados de Licença Sanitária
-            if licenca_sanitaria_data:
-                if licenca_sanitaria_data.get('total_demandado', {}).get('years'):
-                    licenca_sanitaria_data['total_demandado']['years'] = convert_years_keys(licenca_sanitaria_data['total_demandado']['years'])
-                if licenca_sanitaria_data.get('concluidos', {}).get('years'):
-                    licenca_sanitaria_data['concluidos']['years'] = convert_years_keys(licenca_sanitaria_data['concluidos']['years'])
-                if licenca_sanitaria_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    licenca_sanitaria_data['em_andamento']['total']['years'] = convert_years_keys(licenca_sanitaria_data['em_andamento']['total']['years'])
-                for subcat in licenca_sanitaria_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
-            
-            # 3. Buscar dados de Anuência Ambiental da planilha 'ENEL - Legalização CE'
-            # Filtrar apenas registros onde 'Relatório Natureza da Operação' = 'Anuência Ambiental'
-            spreadsheet_name_anuencia = 'ENEL - Legalização CE'
-            filter_natureza_anuencia = 'Anuência Ambiental'
-            result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name=spreadsheet_name_anuencia,
-                years=years,
-                filter_natureza=filter_natureza_anuencia
-            )
+            # 1. Alvarás de Funcionamento
+            result, status = fetches['ce_alvaras'].result()
+            if status == 200:
+                legalizacao_ce_data = result
+            else:
+                logger.warning(f"Erro ao buscar dados de Alvarás: status {status}")
+                complete = False
             
-            if isinstance(result, tuple) and len(result) > 0:
-                if result[1] == 200:
-                    anuencia_ambiental_data = result[0].get_json() if hasattr(result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Anuência Ambiental: status {result[1]}")
-            elif hasattr(result, 'get_json'):
-                anuencia_ambiental_data = result.get_json()
+            # 2-4. Licença Sanitária, Anuência Ambiental e Certificado de aprovação Bombeiro
+            result, status = fetches['ce_natureza'].result()
+            legalizacao_ce_by_natureza = {}
+            if status == 200:
+                legalizacao_ce_by_natureza = result or {}
+            else:
+                logger.warning(f"Erro ao buscar dados de Licença Sanitária, Anuência Ambiental e Certificado de aprovação Bombeiro: status {status}")
+                complete = False
             
-            # Converter anos nos dados de Anuência Ambiental
-            if anuencia_ambiental_data:
-                if anuencia_ambiental_data.get('total_demandado', {}).get('years'):
-                    anuencia_ambiental_data['total_demandado']['years'] = convert_years_keys(anuencia_ambiental_data['total_demandado']['years'])
-                if anuencia_ambiental_data.get('concluidos', {}).get('years'):
-                    anuencia_ambiental_data['concluidos']['years'] = convert_years_keys(anuencia_ambiental_data['concluidos']['years'])
-                if anuencia_ambiental_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    anuencia_ambiental_data['em_andamento']['total']['years'] = convert_years_keys(anuencia_ambiental_data['em_andamento']['total']['years'])
-                for subcat in anuencia_ambiental_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
-
-            # 4. Buscar dados de Certificado de aprovação Bombeiro da planilha 'ENEL - Legalização CE'
-            # Filtrar apenas registros onde 'Relatório Natureza da Operação' = 'Certificado de aprovação Bombeiro'
-            spreadsheet_name_bombeiro = 'ENEL - Legalização CE'
-            filter_natureza_bombeiro = 'Certificado de aprovação Bombeiro'
-            result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name=spreadsheet_name_bombeiro,
-                years=years,
-                filter_natureza=filter_natureza_bombeiro
-            )
-
-            if isinstance(result, tuple) and len(result) > 0:
-                if result[1] == 200:
-                    certificado_bombeiro_data = result[0].get_json() if hasattr(result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Certificado de aprovação Bombeiro: status {result[1]}")
-            elif hasattr(result, 'get_json'):
-                certificado_bombeiro_data = result.get_json()
-
-            # Converter anos nos dados de Certificado de aprovação Bombeiro
-            if certificado_bombeiro_data:
-                if certificado_bombeiro_data.get('total_demandado', {}).get('years'):
-                    certificado_bombeiro_data['total_demandado']['years'] = convert_years_keys(certificado_bombeiro_data['total_demandado']['years'])
-                if certificado_bombeiro_data.get('concluidos', {}).get('years'):
-                    certificado_bombeiro_data['concluidos']['years'] = convert_years_keys(certificado_bombeiro_data['concluidos']['years'])
-                if certificado_bombeiro_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    certificado_bombeiro_data['em_andamento']['total']['years'] = convert_years_keys(certificado_bombeiro_data['em_andamento']['total']['years'])
-                for subcat in certificado_bombeiro_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
+            licenca_sanitaria_data = legalizacao_ce_by_natureza.get(filter_natureza_value)
+            anuencia_ambiental_data = legalizacao_ce_by_natureza.get(filter_natureza_anuencia)
+            certificado_bombeiro_data = legalizacao_ce_by_natureza.get(filter_natureza_bombeiro)
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Legalização CE: {e}", exc_info=True)
+            complete = False
 
     if 'SP' in legalizacao_lista:
         try:
-            from .enel_spreadsheets import _get_enel_spreadsheet_data_internal
-            result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name='Legalização SP',
-                years=years
-            )
-            if isinstance(result, tuple) and len(result) > 0:
-                if result[1] == 200:
-                    legalizacao_sp_data = result[0].get_json() if hasattr(result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Legalização SP: status {result[1]}")
-            elif hasattr(result, 'get_json'):
-                legalizacao_sp_data = result.get_json()
-
-            if legalizacao_sp_data:
-                if legalizacao_sp_data.get('total_demandado', {}).get('years'):
-                    legalizacao_sp_data['total_demandado']['years'] = convert_years_keys(legalizacao_sp_data['total_demandado']['years'])
-                if legalizacao_sp_data.get('concluidos', {}).get('years'):
-                    legalizacao_sp_data['concluidos']['years'] = convert_years_keys(legalizacao_sp_data['concluidos']['years'])
-                if legalizacao_sp_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    legalizacao_sp_data['em_andamento']['total']['years'] = convert_years_keys(legalizacao_sp_data['em_andamento']['total']['years'])
-                for subcat in legalizacao_sp_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
+            result, status = fetches['sp'].result()
+            if status == 200:
+                legalizacao_sp_data = result
+            else:
+                logger.warning(f"Erro ao buscar dados de Legalização SP: status {status}")
+                complete = False
 
             # Serviços Diversos (SP) - aba "MR - Outros Serviços"
-            servicos_result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name='Legalização SP',
-                years=years,
-                sheet_name='MR - Outros Serviços',
-                header_row=1,
-                item_column='Item',
-                item_not_equals='53',
-                year_column_name='ano Acionamento',
-                concluido_statuses=['Serviços diversos concluídos'],
-                status_column_override='Relatório Status detalhado'
-            )
-            if isinstance(servicos_result, tuple) and len(servicos_result) > 0:
-                if servicos_result[1] == 200:
-                    legalizacao_sp_servicos_data = servicos_result[0].get_json() if hasattr(servicos_result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Serviços Diversos (SP): status {servicos_result[1]}")
-            elif hasattr(servicos_result, 'get_json'):
-                legalizacao_sp_servicos_data = servicos_result.get_json()
-
-            if legalizacao_sp_servicos_data:
-                if legalizacao_sp_servicos_data.get('total_demandado', {}).get('years'):
-                    legalizacao_sp_servicos_data['total_demandado']['years'] = convert_years_keys(legalizacao_sp_servicos_data['total_demandado']['years'])
-                if legalizacao_sp_servicos_data.get('concluidos', {}).get('years'):
-                    legalizacao_sp_servicos_data['concluidos']['years'] = convert_years_keys(legalizacao_sp_servicos_data['concluidos']['years'])
-                if legalizacao_sp_servicos_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    legalizacao_sp_servicos_data['em_andamento']['total']['years'] = convert_years_keys(legalizacao_sp_servicos_data['em_andamento']['total']['years'])
-                for subcat in legalizacao_sp_servicos_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
+            servicos_result, servicos_status = fetches['sp_servicos'].result()
+            if servicos_status == 200:
+                legalizacao_sp_servicos_data = servicos_result
+            else:
+                logger.warning(f"Erro ao buscar dados de Serviços Diversos (SP): status {servicos_status}")
+                complete = False
+
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Legalização SP: {e}", exc_info=True)
+            complete = False
 
     if 'RJ' in legalizacao_lista:
         try:
-            from .enel_spreadsheets import _get_enel_spreadsheet_data_internal
-            result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name='LEGALIZAÇÃO RJ_28-04',
-                years=years,
-                sheet_name='Base Alvarás',
-                status_column_override='Status detalhado Relatório',
-                year_column_name='ano Acionamento',
-                year_parse_mode='extract_year',
-                concluido_statuses=['Concluído'],
-                cancelado_statuses=['Cancelado']
-            )
-            if isinstance(result, tuple) and len(result) > 0:
-                if result[1] == 200:
-                    legalizacao_rj_data = result[0].get_json() if hasattr(result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Legalização RJ: status {result[1]}")
-            elif hasattr(result, 'get_json'):
-                legalizacao_rj_data = result.get_json()
-
-            if legalizacao_rj_data:
-                if legalizacao_rj_data.get('total_demandado', {}).get('years'):
-                    legalizacao_rj_data['total_demandado']['years'] = convert_years_keys(legalizacao_rj_data['total_demandado']['years'])
-                if legalizacao_rj_data.get('concluidos', {}).get('years'):
-                    legalizacao_rj_data['concluidos']['years'] = convert_years_keys(legalizacao_rj_data['concluidos']['years'])
-                if legalizacao_rj_data.get('cancelados', {}).get('years'):
-                    legalizacao_rj_data['cancelados']['years'] = convert_years_keys(legalizacao_rj_data['cancelados']['years'])
-                if legalizacao_rj_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    legalizacao_rj_data['em_andamento']['total']['years'] = convert_years_keys(legalizacao_rj_data['em_andamento']['total']['years'])
-                for subcat in legalizacao_rj_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
+            result, status = fetches['rj'].result()
+            if status == 200:
+                legalizacao_rj_data = result
+            else:
+                logger.warning(f"Erro ao buscar dados de Legalização RJ: status {status}")
+                complete = False
 
             # Certificado de Aprovação dos Bombeiros (RJ) - aba "Base Bombeiro"
-            bombeiro_result = _get_enel_spreadsheet_data_internal(
-                spreadsheet_name='LEGALIZAÇÃO RJ_28-04',
-                years=years,
-                sheet_name='Base Bombeiro',
-                status_column_override='Status Geral do imóvel',
-                year_column_name='Ano Acionamento',
-                year_parse_mode='extract_year',
-                concluido_statuses=['CA emitido'],
-                status_exclude=['*']
-            )
-            if isinstance(bombeiro_result, tuple) and len(bombeiro_result) > 0:
-                if bombeiro_result[1] == 200:
-                    legalizacao_rj_bombeiro_data = bombeiro_result[0].get_json() if hasattr(bombeiro_result[0], 'get_json') else None
-                else:
-                    logger.warning(f"Erro ao buscar dados de Bombeiros RJ: status {bombeiro_result[1]}")
-            elif hasattr(bombeiro_result, 'get_json'):
-                legalizacao_rj_bombeiro_data = bombeiro_result.get_json()
+            bombeiro_result, bombeiro_status = fetches['rj_bombeiro'].result()
+            if bombeiro_status == 200:
+                legalizacao_rj_bombeiro_data = bombeiro_result
+            else:
+                logger.warning(f"Erro ao buscar dados de Bombeiros RJ: status {bombeiro_status}")
+                complete = False
 
             if legalizacao_rj_bombeiro_data:
-                if legalizacao_rj_bombeiro_data.get('total_demandado', {}).get('years'):
-                    legalizacao_rj_bombeiro_data['total_demandado']['years'] = convert_years_keys(legalizacao_rj_bombeiro_data['total_demandado']['years'])
-                if legalizacao_rj_bombeiro_data.get('concluidos', {}).get('years'):
-                    legalizacao_rj_bombeiro_data['concluidos']['years'] = convert_years_keys(legalizacao_rj_bombeiro_data['concluidos']['years'])
-                if legalizacao_rj_bombeiro_data.get('em_andamento', {}).get('total', {}).get('years'):
-                    legalizacao_rj_bombeiro_data['em_andamento']['total']['years'] = convert_years_keys(legalizacao_rj_bombeiro_data['em_andamento']['total']['years'])
-                for subcat in legalizacao_rj_bombeiro_data.get('em_andamento', {}).get('subcategorias', []):
-                    if subcat.get('years'):
-                        subcat['years'] = convert_years_keys(subcat['years'])
-
                 # Separar "Não Iniciado" a partir de status específicos
                 nao_iniciado_statuses = ['Aguardando obra Sist. Incêndio - Enel']
                 nao_iniciado_norm = {s.strip().lower() for s in nao_iniciado_statuses}
@@ -1149,20 +1231,20 @@ def generate_pdf(client_id):
                     }
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Legalização RJ: {e}", exc_info=True)
+            complete = False
     
     # Buscar dados de Regularização SP se SP estiver na lista
     if 'SP' in regularizacao_lista:
         try:
             file_path_obj = _find_enel_spreadsheet_file('Regularizações SP')
             if file_path_obj:
-                sheet_data = read_spreadsheet_file(
+                sheet_data = read_spreadsheet_file_stream(
                     file_path=str(file_path_obj),
                     sheet_name=None,
                     header=None
                 )
                 regularizacao_sp_data_dict = _build_regularizacao_sp_macroprocess(sheet_data)
                 # Converter dicionário para objeto com atributos para evitar conflito com .items() do dict
-                from types import SimpleNamespace
                 # Converter cada item da lista também em objeto com atributos
                 items_list = []
                 max_total = 0
@@ -1183,8 +1265,10 @@ def generate_pdf(client_id):
                 )
             else:
                 logger.warning("Planilha Regularizações SP não encontrada")
+                complete = False
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Regularização SP: {e}", exc_info=True)
+            complete = False
     
     # Buscar dados de Regularização RJ se RJ estiver na lista
     regularizacao_rj_data = None
@@ -1193,14 +1277,13 @@ def generate_pdf(client_id):
             file_path_obj = _find_enel_spreadsheet_file('Registral e Notarial - Regularização RJ')
             if file_path_obj:
                 # Ler planilha começando na linha 3 (header_row=2 pois é 0-indexed)
-                sheet_data = read_spreadsheet_file(
+                sheet_data = read_spreadsheet_file_stream(
                     file_path=str(file_path_obj),
                     sheet_name=None,
                     header=2  # Linha 3 (0-indexed = 2)
                 )
                 regularizacao_rj_data_dict = _build_regularizacao_rj_macro_microprocess(sheet_data)
                 # Converter dicionário para objeto com atributos
-                from types import SimpleNamespace
                 items_list = []
                 max_total = 0
                 for item_dict in regularizacao_rj_data_dict.get('items', []):
@@ -1223,8 +1306,10 @@ def generate_pdf(client_id):
                 )
             else:
                 logger.warning("Planilha Registral e Notarial - Regularização RJ não encontrada")
+                complete = False
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Regularização RJ: {e}", exc_info=True)
+            complete = False
 
     # Buscar dados de Regularização CTEEP se CTEEP estiver na lista
     regularizacao_cteep_data = None
@@ -1232,13 +1317,12 @@ def generate_pdf(client_id):
         try:
             file_path_obj = _find_enel_spreadsheet_file('CTEEP ATUALIZADA - BASE MR 2025')
             if file_path_obj:
-                sheet_data = read_spreadsheet_file(
+                sheet_data = read_spreadsheet_file_stream(
                     file_path=str(file_path_obj),
                     sheet_name=None,
                     header=0
                 )
                 regularizacao_cteep_data_dict = _build_regularizacao_cteep_etapa_macro_microprocess(sheet_data)
-                from types import SimpleNamespace
                 items_list = []
                 max_total = 0
                 for item_dict in regularizacao_cteep_data_dict.get('items', []):
@@ -1261,38 +1345,25 @@ def generate_pdf(client_id):
                 )
             else:
                 logger.warning("Planilha CTEEP ATUALIZADA - BASE MR 2025 não encontrada")
+                complete = False
         except Exception as e:
             logger.error(f"Erro ao buscar dados de Regularização CTEEP: {e}", exc_info=True)
+            complete = False
     
     # Renderizar template HTML
-    # #region agent log
-    log_dir = Path('.cursor')
-    log_dir.mkdir(exist_ok=True)
-    try:
-        with open('.cursor/debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps({
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'A',
-                'location': 'reports.py:819',
-                'message': 'Before render_template',
-                'data': {
-                    'regularizacao_lista': regularizacao_lista,
-                    'legalizacao_lista': legalizacao_lista,
-                    'estados_lista': estados_lista,
-                    'regularizacao_sp_data_present': regularizacao_sp_data is not None,
-                    'regularizacao_sp_data_items_count': len(regularizacao_sp_data.get('items', [])) if regularizacao_sp_data else 0
-                },
-                'timestamp': int(datetime.now().timestamp() * 1000)
-            }) + '\n')
-    except Exception:
-        pass
-    # #endregion
+    if config.DEBUG_AGENT_LOG:
+        _agent_log('A', 'reports.py:819', 'Before render_template', {
+            'regularizacao_lista': regularizacao_lista,
+            'legalizacao_lista': legalizacao_lista,
+            'estados_lista': estados_lista,
+            'regularizacao_sp_data_present': regularizacao_sp_data is not None,
+            'regularizacao_sp_data_items_count': len(regularizacao_sp_data.items) if regularizacao_sp_data else 0
+        })
     
     try:
         data_corte = datetime.now().strftime('%d/%m')
-        html_content = render_template(
-            'report_pdf.html',
+        # O template não usa request/session/g nem context processors, então renderiza direto
+        html_content = _get_report_pdf_template().render(
             client_name=client_dict['nome'],
             month_name=month_name,
             year=ano,
@@ -1314,59 +1385,23 @@ def generate_pdf(client_id):
             certificado_bombeiro_data=certificado_bombeiro_data,
             years=years,
             comments=comments,
-            alvaras_comments=alvaras_comments,
-            licenca_comments=licenca_comments,
-            anuencia_comments=anuencia_comments,
-            certificado_bombeiro_comments=certificado_bombeiro_comments,
-            legalizacao_sp_comments=legalizacao_sp_comments,
-            servicos_diversos_sp_comments=servicos_diversos_sp_comments,
-            legalizacao_rj_comments=legalizacao_rj_comments,
-            legalizacao_rj_bombeiro_comments=legalizacao_rj_bombeiro_comments,
-            regularizacao_sp_comments=regularizacao_sp_comments,
-            regularizacao_rj_comments=regularizacao_rj_comments,
-            regularizacao_cteep_comments=regularizacao_cteep_comments,
-            mr_logo_path=mr_logo_base64,
-            client_logo_path=client_logo_base64,
-            fluxograma_cteep_path=fluxograma_cteep_base64
+            **comments_by_page,
+            mr_logo_path=mr_logo_src,
+            client_logo_path=client_logo_src,
+            fluxograma_cteep_path=fluxograma_cteep_src
         )
-        # #region agent log
-        try:
-            with open('.cursor/debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'B',
-                    'location': 'reports.py:870',
-                    'message': 'Template rendered successfully',
-                    'data': {
-                        'html_length': len(html_content),
-                        'html_preview': html_content[:200]
-                    },
-                    'timestamp': int(datetime.now().timestamp() * 1000)
-                }) + '\n')
-        except Exception:
-            pass
-        # #endregion
+        if config.DEBUG_AGENT_LOG:
+            _agent_log('B', 'reports.py:870', 'Template rendered successfully', {
+                'html_length': len(html_content),
+                'html_preview': html_content[:200]
+            })
     except Exception as e:
         logger.error(f"Erro ao renderizar template: {e}", exc_info=True)
-        # #region agent log
-        try:
-            with open('.cursor/debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'C',
-                    'location': 'reports.py:render_template_error',
-                    'message': 'Template render error',
-                    'data': {
-                        'error': str(e),
-                        'error_type': type(e).__name__
-                    },
-                    'timestamp': int(datetime.now().timestamp() * 1000)
-                }) + '\n')
-        except Exception:
-            pass
-        # #endregion
+        if config.DEBUG_AGENT_LOG:
+            _agent_log('C', 'reports.py:render_template_error', 'Template render error', {
+                'error': str(e),
+                'error_type': type(e).__name__
+            })
         return jsonify({'error': f'Erro ao renderizar template: {str(e)}'}), 500
     
     # Log do HTML gerado (primeiros 500 caracteres para debug)
@@ -1374,94 +1409,58 @@ def generate_pdf(client_id):
     
     # Gerar PDF com WeasyPrint
     try:
-        # #region agent log
-        try:
-            with open('.cursor/debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'D',
-                    'location': 'reports.py:before_weasyprint',
-                    'message': 'Before WeasyPrint PDF generation',
-                    'data': {
-                        'html_length': len(html_content),
-                        'images_dir_exists': images_dir.exists() if images_dir else False
-                    },
-                    'timestamp': int(datetime.now().timestamp() * 1000)
-                }) + '\n')
-        except Exception:
-            pass
-        # #endregion
+        if config.DEBUG_AGENT_LOG:
+            _agent_log('D', 'reports.py:before_weasyprint', 'Before WeasyPrint PDF generation', {
+                'html_length': len(html_content),
+                'images_dir_exists': images_dir.exists() if images_dir else False
+            })
         
-        font_config = FontConfiguration()
-
-        # base_url não é mais necessário pois imagens são base64
-        pdf_bytes = HTML(string=html_content, base_url=str(images_dir) if images_dir.exists() else None).write_pdf(
-            font_config=font_config
+        font_config, stylesheets = _report_pdf_assets()
+
+        # PDF escrito direto no arquivo temporário (em memória até PDF_SPOOL_MAX_SIZE, depois
+        # em disco). Logos e fluxograma chegam como bytes pelo url_fetcher; demais URLs seguem o padrão
+        pdf_file = tempfile.SpooledTemporaryFile(max_size=config.PDF_SPOOL_MAX_SIZE)
+        HTML(
+            string=html_content,
+            base_url=str(images_dir) if images_dir.exists() else None,
+            url_fetcher=partial(_pdf_url_fetcher, pdf_images)
+        ).write_pdf(
+            target=pdf_file,
+            stylesheets=stylesheets,
+            font_config=font_config,
+            cache=_pdf_image_cache,
+            full_fonts=config.PDF_FULL_FONTS
         )
+        pdf_size = pdf_file.tell()
 
-        # #region agent log
-        try:
-            with open('.cursor/debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'E',
-                    'location': 'reports.py:after_weasyprint',
-                    'message': 'WeasyPrint PDF generated successfully',
-                    'data': {
-                        'pdf_bytes_length': len(pdf_bytes)
-                    },
-                    'timestamp': int(datetime.now().timestamp() * 1000)
-                }) + '\n')
-        except Exception:
-            pass
-        # #endregion
-        
-        logger.info(f"PDF gerado com sucesso. Tamanho: {len(pdf_bytes)} bytes")
+        if config.DEBUG_AGENT_LOG:
+            _agent_log('E', 'reports.py:after_weasyprint', 'WeasyPrint PDF generated successfully', {
+                'pdf_bytes_length': pdf_size
+            })
         
-        # Verificar se é preview ou download (via query param)
-        is_preview = request.args.get('preview', 'false').lower() == 'true'
+        logger.info(f"PDF gerado com sucesso. Tamanho: {pdf_size} bytes")
         
         # Criar resposta com PDF
         filename = f"relatorio-{client_id}-{ano}-{mes+1:02d}.pdf"
+        pdf_file.seek(0)
+        if pdf_size > config.PDF_SPOOL_MAX_SIZE:
+            # PDF grande (já em disco): envio em streaming, sem cópia em memória nem cache
+            return _pdf_response(None, filename, pdf_file=pdf_file, pdf_size=pdf_size)
         
-        # Se for preview, usar 'inline' para abrir no navegador
-        # Se for download, usar 'attachment' para forçar download
-        disposition = 'inline' if is_preview else 'attachment'
+        with pdf_file:
+            pdf_bytes = pdf_file.read()
+        if pdf_cache_key is not None and complete:
+            _store_pdf(pdf_cache_key, pdf_bytes, filename, config.PDF_CACHE_TTL)
         
-        response = Response(
-            pdf_bytes,
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': f'{disposition}; filename="{filename}"',
-                'Content-Type': 'application/pdf'
-            }
-        )
-
-        return response
+        return _pdf_response(pdf_bytes, filename)
     except Exception as e:
         logger.error(f"Erro ao gerar PDF: {str(e)}", exc_info=True)
-        import traceback
         logger.error(f"Traceback completo: {traceback.format_exc()}")
-        # #region agent log
-        try:
-            with open('.cursor/debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'F',
-                    'location': 'reports.py:weasyprint_exception',
-                    'message': 'WeasyPrint PDF generation exception',
-                    'data': {
-                        'error': str(e),
-                        'error_type': type(e).__name__,
-                        'traceback': traceback.format_exc()
-                    },
-                    'timestamp': int(datetime.now().timestamp() * 1000)
-                }) + '\n')
-        except Exception:
-            pass
-        # #endregion
+        if config.DEBUG_AGENT_LOG:
+            _agent_log('F', 'reports.py:weasyprint_exception', 'WeasyPrint PDF generation exception', {
+                'error': str(e),
+                'error_type': type(e).__name__,
+                'traceback': traceback.format_exc()
+            })
         return jsonify({'error': f'Erro ao gerar PDF: {str(e)}'}), 500
 
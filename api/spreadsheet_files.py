@@ -8,8 +8,22 @@ from pathlib import Path
 from typing import Dict, List, Optional, Any
 import pandas as pd
 
+# openpyxl (opcional) para leitura de .xlsx em streaming
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Textos que o pandas (read_excel) trata como célula vazia por padrão; a leitura em
+# streaming aplica a mesma regra que read_spreadsheet_file
+_NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+})
+
 
 def read_spreadsheet_file(
     file_path: str,
@@ -99,6 +113,109 @@ def read_spreadsheet_file(
         raise ValueError(f"Erro ao ler arquivo: {str(e)}")
 
 
+def _header_names(cells) -> List[str]:
+    """
+    Nomes de colunas como o pandas gera: células vazias viram 'Unnamed: <i>', números
+    inteiros perdem o '.0' e nomes repetidos ganham sufixo ('Coluna.1', 'Coluna.2', ...).
+    """
+    cells = list(cells)
+    while cells and cells[-1] is None:
+        cells.pop()
+    
+    headers = []
+    counts = {}
+    for idx, cell in enumerate(cells):
+        if cell is None:
+            name = f"Unnamed: {idx}"
+        elif isinstance(cell, float) and cell.is_integer():
+            name = str(int(cell))
+        else:
+            name = str(cell)
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        headers.append(name)
+    return headers
+
+
+def _iter_sheet_values(workbook, rows, width: int):
+    """Gera as linhas de dados (células vazias como ''), fechando o workbook ao final."""
+    try:
+        for row in rows:
+            values = tuple('' if value is None or value in _NA_STRINGS else value for value in row)
+            if len(values) < width:
+                values += ('',) * (width - len(values))
+            yield values
+    finally:
+        workbook.close()
+
+
+def read_spreadsheet_file_stream(
+    file_path: str,
+    sheet_name: Optional[str] = None,
+    header: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Variante de read_spreadsheet_file que lê .xlsx em streaming (openpyxl read_only), sem
+    montar DataFrame nem converter todas as células para str.
+    
+    'values' é um iterador de tuplas para ser consumido em uma única passada; as células
+    mantêm o tipo lido (str, int, float, datetime) e as vazias viram ''. O arquivo fica
+    aberto até o iterador ser esgotado ou descartado.
+    Outros formatos (ou ambiente sem openpyxl) usam read_spreadsheet_file.
+    
+    Diferenças em relação a read_spreadsheet_file (igualar exigiria ler a aba duas vezes, pois
+    o pandas decide pelo conteúdo da coluna inteira):
+    - número inteiro chega como int (5); no pandas, em coluna float (com célula vazia ou
+      decimal), str() dá '5.0'
+    - colunas vazias no fim do cabeçalho não viram 'Unnamed: <i>' (o pandas as inclui quando
+      alguma linha de dados chega até elas); as linhas de dados não são cortadas
+    
+    Args:
+        file_path: Caminho para o arquivo
+        sheet_name: Nome da aba. Se None, usa a primeira aba
+        header: Linha a usar como cabeçalho (0-indexed). Se None, usa a primeira linha (0)
+        
+    Returns:
+        Dicionário com 'values' (iterador de linhas), 'headers' e 'sheet_name'
+        
+    Raises:
+        FileNotFoundError: Se o arquivo não existir
+        ValueError: Se o arquivo não puder ser lido
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+    
+    if not OPENPYXL_AVAILABLE or Path(file_path).suffix.lower() != '.xlsx':
+        return read_spreadsheet_file(file_path, sheet_name=sheet_name, header=header)
+    
+    try:
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+    except Exception as e:
+        logger.error(f"Erro ao ler arquivo {file_path}: {str(e)}", exc_info=True)
+        raise ValueError(f"Erro ao ler arquivo: {str(e)}")
+    
+    try:
+        sheet_name = sheet_name or workbook.sheetnames[0]
+        rows = workbook[sheet_name].iter_rows(min_row=(header or 0) + 1, values_only=True)
+        headers = _header_names(next(rows, ()))
+    except Exception as e:
+        workbook.close()
+        logger.error(f"Erro ao ler arquivo {file_path}: {str(e)}", exc_info=True)
+        raise ValueError(f"Erro ao ler arquivo: {str(e)}")
+    
+    logger.info(f"Arquivo Excel aberto em streaming: aba {sheet_name}, {len(headers)} colunas (header={header})")
+    
+    return {
+        'values': _iter_sheet_values(workbook, rows, len(headers)),
+        'headers': headers,
+        'sheet_name': sheet_name
+    }
+
+
 def parse_status_data(
     data: Dict[str, Any],
     status_column: str,
@@ -213,57 +330,41 @@ def parse_status_data(
             except (ValueError, TypeError):
                 pass
     
-    # Separar status principais e outros
-    main_statuses = []
-    other_statuses = []
-    
-    main_status_values = {s['sheet_value'] for s in status_config.get('main_statuses', [])}
-    other_status_values = {s['sheet_value'] for s in status_config.get('other_statuses', [])}
+    # Separar status principais e outros: configuração indexada por sheet_value uma vez
+    # (primeira entrada de cada valor, como na busca linear) em vez de busca por status
+    main_config = status_config.get('main_statuses', [])
+    other_config = status_config.get('other_statuses', [])
+    main_by_value = {}
+    for config_status in main_config:
+        main_by_value.setdefault(config_status['sheet_value'], config_status)
+    other_by_value = {}
+    for config_status in other_config:
+        other_by_value.setdefault(config_status['sheet_value'], config_status)
     
+    main_statuses = {}
+    other_statuses = {}
     for status_value, counts in status_counts.items():
-        if status_value in main_status_values:
-            # Encontrar display_name correspondente
-            main_status_config = next(
-                (s for s in status_config.get('main_statuses', []) if s['sheet_value'] == status_value),
-                None
-            )
-            display_name = main_status_config['display_name'] if main_status_config else status_value
-            
-            main_statuses.append({
-                'name': display_name,
-                'sheet_value': status_value,
-                'years': counts['years'],
-                'total': counts['total'],
-                'percentage': counts['percentage']
-            })
-        elif status_value in other_status_values:
-            # Encontrar display_name correspondente
-            other_status_config = next(
-                (s for s in status_config.get('other_statuses', []) if s['sheet_value'] == status_value),
-                None
-            )
-            display_name = other_status_config['display_name'] if other_status_config else status_value
-            
-            other_statuses.append({
-                'name': display_name,
-                'sheet_value': status_value,
-                'years': counts['years'],
-                'total': counts['total'],
-                'percentage': counts['percentage']
-            })
+        if status_value in main_by_value:
+            target, config_status = main_statuses, main_by_value[status_value]
+        elif status_value in other_by_value:
+            target, config_status = other_statuses, other_by_value[status_value]
+        else:
+            continue
+        target[status_value] = {
+            'name': config_status['display_name'],
+            'sheet_value': status_value,
+            'years': counts['years'],
+            'total': counts['total'],
+            'percentage': counts['percentage']
+        }
     
     # Ordenar conforme ordem na configuração
-    main_statuses_ordered = []
-    for config_status in status_config.get('main_statuses', []):
-        found = next((s for s in main_statuses if s['sheet_value'] == config_status['sheet_value']), None)
-        if found:
-            main_statuses_ordered.append(found)
-    
-    other_statuses_ordered = []
-    for config_status in status_config.get('other_statuses', []):
-        found = next((s for s in other_statuses if s['sheet_value'] == config_status['sheet_value']), None)
-        if found:
-            other_statuses_ordered.append(found)
+    main_statuses_ordered = [
+        main_statuses[s['sheet_value']] for s in main_config if s['sheet_value'] in main_statuses
+    ]
+    other_statuses_ordered = [
+        other_statuses[s['sheet_value']] for s in other_config if s['sheet_value'] in other_statuses
+    ]
     
     return {
         'main_statuses': main_statuses_ordered,
@@ -1,5 +1,8 @@
 import sqlite3
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 # Remover sys.path.insert e imports de repo.api.config
@@ -11,20 +14,157 @@ if not DB_PATH:
 # Garantir path absoluto
 DB_PATH = os.path.abspath(DB_PATH)
 
-def get_db_connection():
+# Tamanho do pool de leitura (WAL permite leitores concorrentes); escrita sempre serializada
+READER_POOL_SIZE = int(os.environ.get('DB_READER_POOL_SIZE', os.cpu_count() or 4))
+
+def _configure_connection(conn, read_only: bool = False):
+    """
+    Aplica os PRAGMAs de produção em uma conexão recém-aberta.
+    Com read_only, a conexão recusa escritas (PRAGMA query_only) e fica em autocommit:
+    leituras nunca abrem transação nem disputam o lock de escrita com o WAL.
+    """
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL;')    # Write-Ahead Logging para multi-processo
+    conn.execute('PRAGMA synchronous=NORMAL;')  # Seguro com WAL; evita fsync a cada commit
+    conn.execute('PRAGMA busy_timeout=5000;')   # Timeout de 5 segundos para locks
+    conn.execute('PRAGMA cache_size=-20000;')   # ~20 MB de cache de páginas por conexão
+    conn.execute('PRAGMA temp_store=MEMORY;')   # Tabelas/índices temporários em memória
+    conn.execute('PRAGMA foreign_keys=ON;')     # Habilitar foreign keys
+    if read_only:
+        conn.execute('PRAGMA query_only=ON;')
+        conn.isolation_level = None
+    return conn
+
+def get_db_connection(read_only: bool = False):
     """
     Retorna uma conexão com o banco de dados SQLite
     Configurado com WAL mode e timeouts para suportar multi-processo (Gunicorn)
+    
+    Args:
+        read_only: Se True, conexão de leitura (query_only, autocommit); se False, conexão de
+            escrita com transações implícitas (o chamador faz commit)
+    
+    Nos endpoints prefira get_pool().reader() / get_pool().writer(), que reaproveitam conexões.
     """
     conn = sqlite3.connect(DB_PATH, timeout=5.0)
-    conn.row_factory = sqlite3.Row
+    return _configure_connection(conn, read_only=read_only)
+
+class _ConnectionPool:
+    """
+    Pool de conexões SQLite reutilizáveis (queue.Queue).
+    
+    As conexões são abertas sob demanda até o tamanho máximo e devolvidas ao pool
+    em vez de fechadas, evitando reabrir o .db/.db-wal/.db-shm a cada requisição.
+    """
     
-    # Configurar PRAGMAs para produção (WAL mode, timeouts, foreign keys)
-    conn.execute('PRAGMA journal_mode=WAL;')  # Write-Ahead Logging para multi-processo
-    conn.execute('PRAGMA busy_timeout=5000;')  # Timeout de 5 segundos para locks
-    conn.execute('PRAGMA foreign_keys=ON;')    # Habilitar foreign keys
+    def __init__(self, size: int, read_only: bool = False):
+        self._size = size
+        self._read_only = read_only
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
     
-    return conn
+    def _reset_after_fork(self):
+        # Conexões SQLite não podem atravessar fork (workers do Gunicorn)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = queue.LifoQueue(maxsize=self._size)
+                    self._created = 0
+                    self._pid = os.getpid()
+    
+    def _acquire(self):
+        self._reset_after_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self._size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                conn = sqlite3.connect(DB_PATH, timeout=5.0, check_same_thread=False)
+                return _configure_connection(conn, read_only=self._read_only)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+    
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+    
+    @contextmanager
+    def connection(self, commit: bool = False):
+        """
+        Empresta uma conexão do pool.
+        
+        Args:
+            commit: Se True, faz commit ao final do bloco (rollback em caso de exceção)
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+    
+    def close_all(self):
+        """Fecha as conexões ociosas (ex: antes de remover o arquivo do banco)"""
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._created -= 1
+
+class DatabasePool:
+    """
+    Pools de conexões do processo: 1 escritor + N leitores.
+    
+    Leitores são somente leitura (query_only, autocommit) e rodam em paralelo sob WAL;
+    toda escrita passa pelo único escritor, que faz commit ao final do bloco.
+    """
+    
+    def __init__(self, reader_size: int):
+        self._writer = _ConnectionPool(1)
+        self._readers = _ConnectionPool(reader_size, read_only=True)
+    
+    def reader(self):
+        """Conexão somente leitura para consultas (SELECT)"""
+        return self._readers.connection()
+    
+    def writer(self):
+        """Conexão para escrita; commit automático ao final do bloco"""
+        return self._writer.connection(commit=True)
+    
+    def close_all(self):
+        self._writer.close_all()
+        self._readers.close_all()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> DatabasePool:
+    """Retorna o pool de conexões do processo (criado na primeira chamada)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DatabasePool(READER_POOL_SIZE)
+    return _pool
 
 def init_database():
     """Inicializa o banco de dados com as tabelas necessárias"""
@@ -79,6 +219,13 @@ def init_database():
         )
     ''')
     
+    # Índice de cobertura da listagem de planilhas do Enel (SQLite não tem INCLUDE):
+    # o SELECT ordenado por spreadsheet_name é servido só pelo índice, sem ler a tabela
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_enel_spreadsheets_listing
+        ON enel_spreadsheets (spreadsheet_name, file_name, sheet_name, status_column, uploaded_at)
+    ''')
+    
     # Inserir cliente ENEL se não existir
     cursor.execute('''
         INSERT OR IGNORE INTO clients (id, nome, logo_path)
@@ -90,6 +237,8 @@ def init_database():
 
 def reset_database():
     """Remove todas as tabelas (usado para testes)"""
+    if _pool is not None:
+        _pool.close_all()
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
     # Também remover arquivos WAL e SHM